@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def build_thumbnails_inline(settings):
+    # Общая БД SQLite в памяти не пускает запись из потока пула.
+    settings.THUMBNAIL_WORKERS = 0
@@ -0,0 +1,210 @@
+import io
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.core.wsgi import get_wsgi_application
+from django.db import connection, connections
+
+
+@contextmanager
+def isolated_database(verbosity=0, name=None):
+    """Замеры идут во временной БД: рабочая база не трогается.
+
+    ``name`` задаёт файл тестовой БД SQLite: общая БД в памяти
+    не пускает параллельную запись из нескольких потоков.
+    """
+    test_settings = connection.settings_dict['TEST']
+    test_name = test_settings.get('NAME')
+    if name:
+        test_settings['NAME'] = name
+    try:
+        old_name = connection.creation.create_test_db(
+            verbosity=verbosity, autoclobber=True, serialize=False
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity)
+    finally:
+        test_settings['NAME'] = test_name
+
+
+def zipf_weights(count, skew):
+    """Веса для выбора с перекосом: первый элемент популярнее всех."""
+    return [1 / rank ** skew for rank in range(1, count + 1)]
+
+
+def measure(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    index = round(fraction * (len(ordered) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Сводка по замерам (в секундах) в миллисекундах."""
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3),
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+def format_summary(summary):
+    if not summary['count']:
+        return 'нет замеров'
+    return (
+        f"n={summary['count']} mean={summary['mean_ms']}ms "
+        f"p50={summary['p50_ms']}ms p99={summary['p99_ms']}ms"
+    )
+
+
+class Progress:
+    """Печатает число обработанных строк и скорость раз в секунду."""
+
+    def __init__(self, write, label, total=None, interval=1.0):
+        self.write = write
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.start = self.shown = time.perf_counter()
+        self.done = 0
+
+    def __call__(self, done):
+        now = time.perf_counter()
+        if now - self.shown < self.interval and done != self.total:
+            return
+        self.shown = now
+        self.show(done)
+
+    def show(self, done):
+        self.done = done
+        elapsed = time.perf_counter() - self.start
+        rate = done / elapsed if elapsed else 0
+        total = f'/{self.total}' if self.total is not None else ''
+        self.write(f'{self.label}: {done}{total} ({rate:.0f} строк/с)')
+
+    def finish(self, done):
+        if done != self.done or not done:
+            self.show(done)
+
+
+def compare(baseline, current, tolerance, metrics=('p50_ms', 'p99_ms')):
+    """Замеры, ставшие хуже базовых больше чем на долю ``tolerance``.
+
+    Оба аргумента - словари {сценарий: сводка summarize()}.
+    """
+    regressions = []
+    for name, summary in current.items():
+        old = baseline.get(name)
+        if not old or not old.get('count') or not summary.get('count'):
+            continue
+        for metric in metrics:
+            if summary[metric] > old[metric] * (1 + tolerance):
+                regressions.append((name, metric, old[metric],
+                                    summary[metric]))
+    return regressions
+
+
+class WSGIDriver:
+    """Нагрузка прямо на WSGI-приложение, без тестового клиента.
+
+    Запросы проходят тот же путь, что и от gunicorn: все middleware,
+    сессии по cookie и проверку CSRF. ``run`` гоняет их в несколько
+    потоков и возвращает задержки, число ошибок и общее время.
+    """
+
+    def __init__(self, application=None):
+        self.application = application or get_wsgi_application()
+
+    def environ(self, method, path, data=None, cookies=None, headers=None):
+        path, _, query = path.partition('?')
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'CONTENT_LENGTH': str(len(body)),
+            'CONTENT_TYPE': (
+                'application/x-www-form-urlencoded' if body else ''
+            ),
+        }
+        if cookies:
+            environ['HTTP_COOKIE'] = '; '.join(
+                f'{name}={value}' for name, value in cookies.items()
+            )
+        environ.update(headers or {})
+        return environ
+
+    def request(self, method, path, data=None, cookies=None, headers=None):
+        status = []
+
+        def start_response(value, response_headers, exc_info=None):
+            status.append(int(value.split()[0]))
+
+        result = self.application(
+            self.environ(method, path, data, cookies, headers),
+            start_response,
+        )
+        try:
+            for _ in result:
+                pass
+        finally:
+            close = getattr(result, 'close', None)
+            if close:
+                close()
+        return status[0]
+
+    def run(self, requests, concurrency=1):
+        """``requests`` - список kwargs для ``request``."""
+        samples, errors = [], 0
+        lock = threading.Lock()
+
+        def send(kwargs):
+            nonlocal errors
+            try:
+                elapsed, status = measure(self.request, **kwargs)
+                failed = status >= 400
+            except Exception:
+                elapsed, failed = None, True
+            finally:
+                # Соединения потоков пула больше не понадобятся.
+                if concurrency > 1:
+                    connections.close_all()
+            with lock:
+                if failed:
+                    errors += 1
+                else:
+                    samples.append(elapsed)
+
+        start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as pool:
+                list(pool.map(send, requests))
+        else:
+            for kwargs in requests:
+                send(kwargs)
+        return samples, errors, time.perf_counter() - start
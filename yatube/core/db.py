@@ -0,0 +1,26 @@
+"""PRAGMA для соединений SQLite из настройки SQLITE_PRAGMAS.
+
+Django открывает соединение сам, поэтому PRAGMA выполняются в
+обработчике connection_created - для каждого нового соединения
+любого алиаса на SQLite. Порядок важен: busy_timeout ставится первым,
+иначе переключение journal_mode под нагрузкой сразу падает с
+«database is locked».
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return
+    pragmas = settings.SQLITE_PRAGMAS
+    if not pragmas:
+        return
+    cursor = connection.connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
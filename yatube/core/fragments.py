@@ -0,0 +1,76 @@
+"""Персональные куски страниц, общих для всех пользователей.
+
+Страница ленты кэшируется один раз на всех, а то, что зависит от
+пользователя (шапка, переключатель лент, кнопка подписки), выносится
+во фрагменты: ``{% personal 'includes/header.html' %}`` из библиотеки
+``personal``. Пока страница рисуется для общего кэша (см. shared),
+тег оставляет вместо фрагмента метку, а stitch перед отдачей ответа
+рисует фрагменты для текущего запроса. Вне общего кэша тег сразу
+рисует фрагмент.
+
+Фрагмент получает только переданные в теге простые значения (они
+сериализуются в метку) и контекст-процессоры запроса; остальное
+досчитывает функция, зарегистрированная через ``context``.
+"""
+import base64
+import json
+import re
+from contextlib import contextmanager
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = re.compile(r'<!--personal:([A-Za-z0-9_-]+)-->')
+
+_context_funcs = {}
+
+
+def context(template_name):
+    """Регистрирует функцию (request, **kwargs) -> dict для фрагмента."""
+    def decorator(func):
+        _context_funcs[template_name] = func
+        return func
+    return decorator
+
+
+def render(request, template_name, kwargs):
+    data = dict(kwargs)
+    func = _context_funcs.get(template_name)
+    if func is not None:
+        data.update(func(request, **kwargs))
+    return render_to_string(template_name, data, request)
+
+
+def marker(template_name, kwargs):
+    raw = json.dumps([template_name, kwargs], separators=(',', ':'))
+    token = base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+    return mark_safe(f'<!--personal:{token}-->')
+
+
+def _decode(token):
+    raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+    return json.loads(raw.decode())
+
+
+def stitch(request, content):
+    """Рисует фрагменты на месте меток в байтах ``content``."""
+    text = content.decode()
+    if '<!--personal:' not in text:
+        return content
+    return MARKER.sub(
+        lambda match: render(request, *_decode(match.group(1))), text
+    ).encode()
+
+
+def is_shared(request):
+    return getattr(request, '_shared_render', False)
+
+
+@contextmanager
+def shared(request):
+    """Отрисовка для общего кэша: фрагменты остаются метками."""
+    request._shared_render = True
+    try:
+        yield
+    finally:
+        request._shared_render = False
@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from core.bench import format_summary, measure, summarize, zipf_weights
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'sqlite': 'core.cache_backends.SQLiteCache',
+}
+
+
+def worker(backend, location, options, seed, queue):
+    cache = import_string(BACKENDS[backend])(
+        location, {'TIMEOUT': None, 'OPTIONS': {
+            'MAX_ENTRIES': options['keys'] * 2,
+        }}
+    )
+    rng = random.Random(seed)
+    keys = [f'page:{idx}' for idx in range(options['keys'])]
+    weights = zipf_weights(len(keys), options['skew'])
+    payload = b'x' * options['value_size']
+    hits, misses = [], 0
+    for key in rng.choices(keys, weights, k=options['requests']):
+        elapsed, value = measure(cache.get, key)
+        if value is None:
+            misses += 1
+            cache.set(key, payload)
+        else:
+            hits.append(elapsed)
+    queue.put((hits, misses))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает LocMemCache и общий SQLiteCache под нагрузкой '
+        'из нескольких процессов: задержку попаданий и долю попаданий'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='обращений к кэшу на процесс')
+        parser.add_argument('--keys', type=int, default=2000)
+        parser.add_argument('--value-size', type=int, default=20 * 1024)
+        parser.add_argument('--skew', type=float, default=1.1)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            for backend in BACKENDS:
+                location = (
+                    os.path.join(directory, 'cache.sqlite3')
+                    if backend == 'sqlite' else 'bench'
+                )
+                self.run_backend(backend, location, options)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run_backend(self, backend, location, options):
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                backend, location, options, options['seed'] + idx, queue,
+            ))
+            for idx in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        hits = [elapsed for samples, _ in results for elapsed in samples]
+        misses = sum(missed for _, missed in results)
+        total = len(hits) + misses
+        self.stdout.write(
+            f'{backend}: попаданий {len(hits) / total:.1%}, '
+            f'задержка попадания: {format_summary(summarize(hits))}'
+        )
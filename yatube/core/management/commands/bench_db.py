@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from core.bench import format_summary, isolated_database, measure, summarize
+from posts import synthetic
+from posts.models import Comment, Post
+
+
+def read(rng, user_ids, post_ids):
+    page = Paginator(Post.objects.index_feed(), 10).page(1)
+    return list(page)
+
+
+def write(rng, user_ids, post_ids):
+    return Comment.objects.create(
+        post_id=rng.choice(post_ids), author_id=rng.choice(user_ids),
+        text=synthetic.make_text(rng, 1, 10),
+    )
+
+
+ACTIONS = {'read': read, 'write': write}
+
+
+def worker(role, duration, seed, queue):
+    rng = random.Random(seed)
+    user_ids = list(synthetic.User.objects.values_list('pk', flat=True))
+    post_ids = list(Post.objects.values_list('pk', flat=True))
+    samples, errors = [], 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        # Границы запроса как у WSGI-обработчика: по ним Django
+        # закрывает соединения, у которых истёк CONN_MAX_AGE.
+        request_started.send(sender=None)
+        try:
+            elapsed, _ = measure(ACTIONS[role], rng, user_ids, post_ids)
+            samples.append(elapsed)
+        except OperationalError:
+            errors += 1
+        finally:
+            request_finished.send(sender=None)
+    connections.close_all()
+    queue.put((role, samples, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает SQLite по умолчанию и боевой профиль '
+        '(settings_production: PRAGMA и CONN_MAX_AGE) под параллельным '
+        'чтением ленты и записью комментариев из нескольких процессов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5,
+                            help='секунд нагрузки на профиль')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        production = import_module('yatube.settings_production')
+        profiles = {
+            'default': ({}, 0),
+            'tuned': (
+                production.SQLITE_PRAGMAS,
+                production.DATABASES['default'].get('CONN_MAX_AGE', 0),
+            ),
+        }
+        directory = tempfile.mkdtemp()
+        try:
+            for name, (pragmas, max_age) in profiles.items():
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    self.run_profile(
+                        name, os.path.join(directory, f'{name}.sqlite3'),
+                        max_age, options,
+                    )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        user_ids = synthetic.create_users(options['users'])
+        weights = synthetic.create_follow_graph(rng, user_ids, 20, 1.1)
+        group_ids = synthetic.create_groups(10)
+        post_ids = synthetic.create_posts(
+            rng, user_ids, weights, options['posts'], group_ids
+        )
+        synthetic.create_comments(
+            rng, user_ids, post_ids, options['posts'] * 2
+        )
+        synthetic.rebuild_derived()
+
+    def run_profile(self, name, path, max_age, options):
+        old_max_age = connection.settings_dict['CONN_MAX_AGE']
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        try:
+            with isolated_database(name=path):
+                self.seed(options)
+                results = self.load(options)
+        finally:
+            connection.settings_dict['CONN_MAX_AGE'] = old_max_age
+        duration = options['duration']
+        for role in ACTIONS:
+            samples = [elapsed for kind, done, _ in results if kind == role
+                       for elapsed in done]
+            errors = sum(failed for kind, _, failed in results
+                         if kind == role)
+            self.stdout.write(
+                f'{name} {role}: {len(samples) / duration:.0f}/с, '
+                f'ошибок блокировки {errors}, '
+                f'{format_summary(summarize(samples))}'
+            )
+
+    def load(self, options):
+        # Дочерние процессы открывают свои соединения.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        queue = context.Queue()
+        roles = (
+            ['read'] * options['readers'] + ['write'] * options['writers']
+        )
+        processes = [
+            context.Process(target=worker, args=(
+                role, options['duration'], options['seed'] + idx, queue,
+            ))
+            for idx, role in enumerate(roles)
+        ]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        return results
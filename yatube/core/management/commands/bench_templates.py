@@ -0,0 +1,115 @@
+import random
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from core import profiling
+from core.bench import isolated_database, summarize
+from core.warmup import warm_templates
+from posts import synthetic
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время отрисовки страниц без кэша шаблонов и с '
+        'кэширующим загрузчиком из settings_production, а также первый '
+        'запрос после старта с предварительной компиляцией и без неё'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200,
+                            help='запросов на страницу')
+        parser.add_argument('--boots', type=int, default=20,
+                            help='сколько раз мерить первый запрос')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        uncached = [{
+            **settings.TEMPLATES[0],
+            'APP_DIRS': False,
+            'OPTIONS': {
+                **settings.TEMPLATES[0]['OPTIONS'],
+                'debug': False,
+                'loaders': [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ],
+            },
+        }]
+        cached = import_module('yatube.settings_production').TEMPLATES
+        setup_test_environment()
+        try:
+            with isolated_database():
+                self.seed(options['seed'])
+                self.client = Client()
+                self.steady('без кэша', uncached, options)
+                self.steady('кэш', cached, options)
+                self.boot('первый запрос', cached, False, options)
+                self.boot('первый запрос с прогревом', cached, True, options)
+        finally:
+            teardown_test_environment()
+
+    def seed(self, seed):
+        rng = random.Random(seed)
+        user_ids = synthetic.create_users(200)
+        weights = synthetic.create_follow_graph(rng, user_ids, 10, 1.1)
+        group_ids = synthetic.create_groups(10)
+        post_ids = synthetic.create_posts(rng, user_ids, weights, 2000,
+                                          group_ids)
+        synthetic.create_comments(rng, user_ids, post_ids, 4000)
+        synthetic.rebuild_derived()
+        post = Post.objects.order_by('pk').first()
+        self.pages = {
+            'index': reverse('posts:index'),
+            'group_list': reverse('posts:group_list', args=[
+                Group.objects.order_by('pk').first().slug
+            ]),
+            'profile': reverse('posts:profile', args=[
+                User.objects.get(pk=user_ids[0]).username
+            ]),
+            'post_detail': reverse('posts:post_detail', args=[post.pk]),
+            'login': reverse('users:login'),
+        }
+
+    def get(self, path):
+        # Кэш лент сбрасываем: иначе страница не отрисовывается вовсе.
+        cache.clear()
+        self.client.get(path)
+        return profiling.records()[-1]
+
+    def steady(self, label, templates, options):
+        with override_settings(TEMPLATES=templates):
+            for name, path in self.pages.items():
+                self.get(path)
+                records = [self.get(path)
+                           for _ in range(options['requests'])]
+                tpl = summarize([r['template_ms'] / 1000 for r in records])
+                total = summarize([r['total_ms'] / 1000 for r in records])
+                self.stdout.write(
+                    f"{label} {name}: шаблоны p50={tpl['p50_ms']}ms, "
+                    f"запрос p50={total['p50_ms']}ms"
+                )
+
+    def boot(self, label, templates, warm, options):
+        totals = []
+        for _ in range(options['boots']):
+            # override_settings пересоздаёт движки шаблонов: как новый
+            # воркер с пустым кэшем.
+            with override_settings(TEMPLATES=templates):
+                if warm:
+                    warm_templates()
+                totals.append(sum(
+                    self.get(path)['total_ms'] for path in self.pages.values()
+                ))
+        summary = summarize([total / 1000 for total in totals])
+        self.stdout.write(
+            f"{label}: все страницы по разу, p50={summary['p50_ms']}ms"
+        )
@@ -0,0 +1,37 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.routing import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует базу default в реплики из DATABASE_REPLICAS; только '
+        'для реплик-файлов SQLite, настоящие реплики синхронизирует '
+        'сервер БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            help='повторять каждые N секунд')
+
+    def handle(self, *args, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        replicas = [connections[alias] for alias in settings.DATABASE_REPLICAS]
+        if not replicas:
+            raise CommandError('DATABASE_REPLICAS пуст')
+        if any(db.vendor != 'sqlite' for db in [source, *replicas]):
+            raise CommandError('Поддерживаются только базы SQLite')
+        while True:
+            start = time.perf_counter()
+            for replica in replicas:
+                copy_database(source, replica.settings_dict['NAME'])
+            self.stdout.write(
+                f'реплики обновлены за {time.perf_counter() - start:.2f} с'
+            )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
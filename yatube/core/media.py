@@ -0,0 +1,164 @@
+"""Картинки постов и миниатюры из MEDIA_ROOT на боевом сервере.
+
+Файл уходит FileResponse: под gunicorn через sendfile, в том числе
+кусок по Range (сервер берёт смещение открытого файла и
+Content-Length). ETag и Last-Modified - из stat файла, 304 и 412
+считает get_conditional_response. Если впереди есть прокси,
+MEDIA_OFFLOAD отдаёт ему файл заголовком X-Accel-Redirect или
+X-Sendfile: Django только проверяет путь.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class RangeFile:
+    """Файл, который читается только до конца куска.
+
+    fileno и текущее смещение остаются настоящими: по ним
+    wsgi.file_wrapper сервера делает sendfile.
+    """
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def find(path):
+    """Имя, путь и stat файла в MEDIA_ROOT или Http404."""
+    # Префикс проверяется после «..», иначе posts/../ открыл бы всё.
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(tuple(settings.MEDIA_SERVE_PREFIXES)):
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return path, full_path, stat
+
+
+def parse_range(header, size):
+    """(начало, длина) для одного диапазона bytes=; None - весь файл.
+
+    Несколько диапазонов сразу не поддерживаются: на них, как и на
+    непонятный заголовок, отдаётся весь файл. Диапазон за концом
+    файла - ValueError (ответ 416).
+    """
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.group(0) == 'bytes=-':
+        return None
+    first, last = match.groups()
+    if not first:
+        length = min(int(last), size)
+        if not length:
+            raise ValueError(header)
+        return size - length, length
+    first = int(first)
+    last = min(int(last), size - 1) if last else size - 1
+    if first >= size or last < first:
+        raise ValueError(header)
+    return first, last - first + 1
+
+
+def range_applies(request, etag, last_modified):
+    """If-Range: кусок отдаётся, только если файл не изменился."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def cache_control(path):
+    if path.startswith(tuple(settings.MEDIA_IMMUTABLE_PREFIXES)):
+        return IMMUTABLE
+    return f'public, max-age={settings.MEDIA_MAX_AGE}'
+
+
+def offload(path, full_path, content_type):
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(
+            settings.MEDIA_OFFLOAD_PREFIX + path
+        )
+    else:
+        response['X-Sendfile'] = full_path
+    response['Cache-Control'] = cache_control(path)
+    return response
+
+
+@require_safe
+def serve(request, path):
+    path, full_path, stat = find(path)
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    if settings.MEDIA_OFFLOAD:
+        return offload(path, full_path, content_type)
+    last_modified = int(stat.st_mtime)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        size = stat.st_size
+        header = request.META.get('HTTP_RANGE', '')
+        if not range_applies(request, etag, last_modified):
+            header = ''
+        try:
+            found = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        file = open(full_path, 'rb')
+        if found:
+            start, length = found
+            response = FileResponse(
+                RangeFile(file, start, length), status=206,
+                content_type=content_type,
+            )
+            response['Content-Length'] = length
+            response['Content-Range'] = (
+                f'bytes {start}-{start + length - 1}/{size}'
+            )
+        else:
+            response = FileResponse(file, content_type=content_type)
+        response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Cache-Control'] = cache_control(path)
+    return response
@@ -0,0 +1,60 @@
+import logging
+
+from django.conf import settings
+
+from . import profiling, routing
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilingMiddleware:
+    """Считает SQL, шаблоны и кэш каждого запроса.
+
+    Замер уходит в кольцевой буфер (см. core.profiling) и в заголовок
+    Server-Timing. Превышение QUERY_BUDGETS пишется в лог, а при
+    QUERY_BUDGET_ERRORS прерывает запрос исключением - так бюджеты
+    проверяются в тестах.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        profiling.instrument_templates()
+
+    def __call__(self, request):
+        with profiling.collect() as stats:
+            response = self.get_response(request)
+        match = request.resolver_match
+        view = match.view_name if match else None
+        record = stats.as_record(view, request, response)
+        profiling.add(record)
+        response['Server-Timing'] = profiling.server_timing(record)
+        problem = profiling.check_budget(record)
+        if problem:
+            if settings.QUERY_BUDGET_ERRORS:
+                raise profiling.QueryBudgetExceeded(problem)
+            logger.warning(problem)
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Read-your-writes при чтении с реплик (core.routing).
+
+    Если запрос что-то записал в default, клиент получает куку
+    REPLICA_PIN_COOKIE, и пока она жива, его запросы читают из default.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+        cookie = settings.REPLICA_PIN_COOKIE
+        with routing.request_scope(cookie in request.COOKIES) as writes:
+            response = self.get_response(request)
+        if writes.seen:
+            response.set_cookie(
+                cookie, '1', max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -0,0 +1,220 @@
+"""Статистика запросов к сайту: SQL, шаблоны, кэш, размер ответа.
+
+Замеры последних PROFILING_BUFFER_SIZE запросов лежат в кольцевом
+буфере процесса: у каждого воркера gunicorn он свой.
+"""
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+from .bench import percentile
+
+_local = threading.local()
+_lock = threading.Lock()
+_records = None
+_missing = object()
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.in_get_many = False
+
+    def as_record(self, view, request, response):
+        size = None if response.streaming else len(response.content)
+        return {
+            'time': time.time(),
+            'view': view,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'queries': self.queries,
+            'sql_ms': round(self.sql_time * 1000, 3),
+            'template_ms': round(self.template_time * 1000, 3),
+            'total_ms': round((time.perf_counter() - self.start) * 1000, 3),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'size': size,
+        }
+
+
+def current():
+    return getattr(_local, 'stats', None)
+
+
+def _count_query(execute, sql, params, many, context):
+    stats = current()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if stats is not None:
+            stats.queries += 1
+            stats.sql_time += time.perf_counter() - start
+
+
+@contextmanager
+def _count_cache(stats):
+    # Подменяем методы экземпляра: у каждого потока он свой
+    # (django.core.cache.caches), так что чужие запросы не задеты.
+    backend = caches['default']
+    get, get_many = backend.get, backend.get_many
+
+    def counted_get(key, default=None, version=None):
+        value = get(key, _missing, version=version)
+        if not stats.in_get_many:
+            if value is _missing:
+                stats.cache_misses += 1
+            else:
+                stats.cache_hits += 1
+        return default if value is _missing else value
+
+    def counted_get_many(keys, version=None):
+        # BaseCache.get_many ходит в get: там не считаем второй раз.
+        keys = list(keys)
+        stats.in_get_many = True
+        try:
+            found = get_many(keys, version=version)
+        finally:
+            stats.in_get_many = False
+        stats.cache_hits += len(found)
+        stats.cache_misses += len(keys) - len(found)
+        return found
+
+    backend.get, backend.get_many = counted_get, counted_get_many
+    try:
+        yield
+    finally:
+        del backend.get, backend.get_many
+
+
+def instrument_templates():
+    """Время отрисовки считается по внешнему шаблону, без include."""
+    original = Template._render
+    if getattr(original, 'profiled', False):
+        return
+
+    def _render(self, context):
+        stats = current()
+        if stats is None or stats.template_depth:
+            return original(self, context)
+        stats.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            stats.template_depth -= 1
+            stats.template_time += time.perf_counter() - start
+
+    _render.profiled = True
+    Template._render = _render
+
+
+@contextmanager
+def collect():
+    stats = RequestStats()
+    _local.stats = stats
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(_count_query)
+                )
+            stack.enter_context(_count_cache(stats))
+            yield stats
+    finally:
+        _local.stats = None
+
+
+def get_records():
+    global _records
+    if _records is None:
+        _records = deque(maxlen=settings.PROFILING_BUFFER_SIZE)
+    return _records
+
+
+def add(record):
+    with _lock:
+        get_records().append(record)
+
+
+def records():
+    with _lock:
+        return list(get_records())
+
+
+def clear():
+    with _lock:
+        get_records().clear()
+
+
+def check_budget(record):
+    """Текст нарушения бюджета запросов или None."""
+    budget = settings.QUERY_BUDGETS.get(record['view'])
+    if budget is None or record['queries'] <= budget:
+        return None
+    return (
+        f"{record['view']} ({record['path']}): {record['queries']} "
+        f'SQL-запросов при бюджете {budget}'
+    )
+
+
+def server_timing(record):
+    return ', '.join((
+        f"db;dur={record['sql_ms']};desc=\"{record['queries']} queries\"",
+        f"tpl;dur={record['template_ms']}",
+        f"cache;desc=\"{record['cache_hits']} hits "
+        f"{record['cache_misses']} misses\"",
+        f"total;dur={record['total_ms']}",
+    ))
+
+
+def summary(rows=None):
+    """Сводка по именам URL, самые затратные по суммарному времени сверху."""
+    grouped = defaultdict(list)
+    for record in records() if rows is None else rows:
+        grouped[record['view']].append(record)
+    result = []
+    for view, items in grouped.items():
+        total = [item['total_ms'] for item in items]
+        queries = [item['queries'] for item in items]
+        hits = sum(item['cache_hits'] for item in items)
+        lookups = hits + sum(item['cache_misses'] for item in items)
+        sizes = [item['size'] for item in items if item['size'] is not None]
+        result.append({
+            'view': view,
+            'requests': len(items),
+            'total_ms': round(sum(total), 3),
+            'mean_ms': round(sum(total) / len(items), 3),
+            'p99_ms': percentile(total, 0.99),
+            'mean_queries': round(sum(queries) / len(items), 1),
+            'max_queries': max(queries),
+            'budget': settings.QUERY_BUDGETS.get(view),
+            'over_budget': sum(1 for item in items if check_budget(item)),
+            'sql_ms': round(
+                sum(item['sql_ms'] for item in items) / len(items), 3
+            ),
+            'template_ms': round(
+                sum(item['template_ms'] for item in items) / len(items), 3
+            ),
+            'cache_hit_ratio': round(hits / lookups, 3) if lookups else None,
+            'mean_size': round(sum(sizes) / len(sizes)) if sizes else None,
+        })
+    result.sort(key=lambda row: row['total_ms'], reverse=True)
+    return result
@@ -0,0 +1,106 @@
+"""Чтение лент с реплик, запись - только в default.
+
+С реплики читают лишь вьюхи под декоратором use_replica и только на
+GET и HEAD; все остальные запросы к БД идут в default. Клиент, который
+только что что-то записал, REPLICA_PIN_SECONDS читает тоже из default
+(см. ReplicaPinMiddleware): свой пост или комментарий он увидит, даже
+если реплика отстаёт. Без DATABASE_REPLICAS всё работает как раньше.
+"""
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+_local = threading.local()
+
+
+def is_pinned():
+    """Клиент недавно писал и читает только из default."""
+    return getattr(_local, 'pinned', False)
+
+
+def reads_from_replica():
+    return bool(settings.DATABASE_REPLICAS) and getattr(
+        _local, 'replica', False
+    ) and not is_pinned()
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if reads_from_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии default: объекты из них можно связывать.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+def use_replica(view):
+    """Вьюха читает с реплики, если запрос ничего не меняет."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        _local.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = False
+    return wrapper
+
+
+class Writes:
+    """execute_wrapper: замечает, что запрос что-то записал в default.
+
+    router.db_for_write тут не помогает: через него идёт и
+    get_or_create, который чаще всего только читает.
+    """
+
+    def __init__(self):
+        self.seen = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.seen and sql.lstrip()[:7].upper().startswith(
+            WRITE_STATEMENTS
+        ):
+            self.seen = True
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def request_scope(pinned=False):
+    """Границы запроса: ``pinned`` не пускает его на реплики."""
+    writes = Writes()
+    _local.pinned = pinned
+    try:
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(writes):
+            yield writes
+    finally:
+        _local.pinned = False
+
+
+def copy_database(source, path):
+    """Копия базы соединения ``source`` в файл SQLite ``path``.
+
+    Backup API пишет прямо в файл реплики под её блокировкой: открытые
+    соединения реплики после копии видят новые данные целиком.
+    """
+    source.ensure_connection()
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
@@ -0,0 +1,226 @@
+"""Статика на боевом сервере без отдельного nginx.
+
+collectstatic с CompressedManifestStorage кладёт в STATIC_ROOT копии
+файлов с хэшем содержимого в имени (их и подставляет ``{% static %}``)
+и рядом с текстовыми - сжатые .gz, а если установлен brotli, то и .br.
+StaticFiles отдаёт всё это прямо из WSGI-процесса, не доходя до
+Django: файлы с хэшем - с кэшем на год и immutable, остальные - с
+коротким кэшем и ETag. Тело уходит через wsgi.file_wrapper: gunicorn
+отправляет его sendfile, без копирования через Python.
+"""
+import gzip
+import io
+import logging
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from wsgiref.util import FileWrapper
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.utils.functional import cached_property
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE = (
+    '.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml',
+    '.ico', '.eot', '.ttf',
+)
+# Сжатая копия, которая выигрывает меньше 5%, не стоит лишнего файла.
+MIN_RATIO = 0.95
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT = 'public, max-age=60'
+BLOCK_SIZE = 64 * 1024
+
+
+def gzip_bytes(data):
+    buffer = io.BytesIO()
+    # mtime=0: одинаковый вход даёт одинаковый .gz на каждой сборке.
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as archive:
+        archive.write(data)
+    return buffer.getvalue()
+
+
+ENCODERS = [('gzip', '.gz', gzip_bytes)]
+if brotli is not None:
+    ENCODERS.insert(0, ('br', '.br', brotli.compress))
+
+
+def compress(path):
+    """Пишет рядом с файлом сжатые копии; возвращает их пути."""
+    if not path.endswith(COMPRESSIBLE):
+        return []
+    with open(path, 'rb') as source:
+        data = source.read()
+    written = []
+    for _, suffix, encode in ENCODERS:
+        packed = encode(data)
+        if len(packed) >= len(data) * MIN_RATIO:
+            continue
+        with open(path + suffix, 'wb') as target:
+            target.write(packed)
+        written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """Хэш в именах файлов и сжатые копии после collectstatic."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if self.exists(name):
+                compress(self.path(name))
+
+    def stored_name(self, name):
+        # Файла нет в сборке - ссылка без хэша, как без манифеста, а не
+        # ошибка 500 на каждой странице с этим тегом. StaticFiles отдаёт
+        # такие имена с коротким кэшем; в лог - один раз на имя.
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            if name not in self.missing:
+                self.missing.add(name)
+                logger.warning('Нет в манифесте статики: %s', name)
+            return name
+
+    @cached_property
+    def missing(self):
+        return set()
+
+
+class StaticFile:
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.path = path
+        self.size = stat.st_size
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.mtime = int(stat.st_mtime)
+        self.etag = f'"{self.mtime:x}-{self.size:x}"'
+        content_type, _ = mimetypes.guess_type(path)
+        self.content_type = content_type or 'application/octet-stream'
+        self.cache_control = IMMUTABLE if immutable else SHORT
+        # Порядок - предпочтение: br, затем gzip.
+        self.encodings = []
+        for coding, suffix, _ in ENCODERS:
+            if os.path.exists(path + suffix):
+                size = os.stat(path + suffix).st_size
+                etag = f'"{self.mtime:x}-{self.size:x}-{coding}"'
+                self.encodings.append((coding, path + suffix, size, etag))
+
+
+def accepted_codings(header):
+    codings = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        params = params.replace(' ', '')
+        if params in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        codings.add(coding.strip().lower())
+    return codings
+
+
+class StaticFiles:
+    """WSGI-обёртка: STATIC_URL из STATIC_ROOT, остальное - приложению.
+
+    Список файлов читается один раз при старте воркера: после
+    collectstatic воркеры перезапускают. Неизвестный путь под
+    STATIC_URL тоже уходит в приложение и получает его 404.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan()
+
+    def scan(self):
+        files = {}
+        if not self.root or not os.path.isdir(self.root):
+            return files
+        hashed = set(self.manifest().values())
+        compressed = tuple(suffix for _, suffix, _ in ENCODERS)
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith(compressed):
+                    continue
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, self.root).replace(
+                    os.sep, '/'
+                )
+                files[self.prefix + relative] = StaticFile(
+                    path, relative in hashed
+                )
+        return files
+
+    def manifest(self):
+        storage = ManifestStaticFilesStorage(location=self.root)
+        return storage.load_manifest()
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        # PATH_INFO по PEP 3333 - байты UTF-8, прочитанные как latin-1.
+        path = path.encode('latin-1').decode('utf-8', 'replace')
+        static = self.files.get(path)
+        if static is None:
+            return self.application(environ, start_response)
+        return self.serve(static, environ, start_response)
+
+    def serve(self, static, environ, start_response):
+        method = environ['REQUEST_METHOD']
+        if method not in ('GET', 'HEAD'):
+            start_response('405 Method Not Allowed', [
+                ('Allow', 'GET, HEAD'), ('Content-Length', '0'),
+            ])
+            return []
+        headers = [
+            ('Cache-Control', static.cache_control),
+            ('Last-Modified', static.last_modified),
+        ]
+        if static.encodings:
+            headers.append(('Vary', 'Accept-Encoding'))
+        path, size, etag = static.path, static.size, static.etag
+        accepted = accepted_codings(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        for coding, coded_path, coded_size, coded_etag in static.encodings:
+            if coding in accepted:
+                path, size, etag = coded_path, coded_size, coded_etag
+                headers.append(('Content-Encoding', coding))
+                break
+        headers.append(('ETag', etag))
+        if self.not_modified(environ, static, etag):
+            start_response('304 Not Modified', headers)
+            return []
+        headers += [
+            ('Content-Type', static.content_type),
+            ('Content-Length', str(size)),
+        ]
+        start_response('200 OK', headers)
+        if method == 'HEAD':
+            return []
+        file_wrapper = environ.get('wsgi.file_wrapper', FileWrapper)
+        return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
+
+    def not_modified(self, environ, static, etag):
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags or f'W/{etag}' in tags
+        if_modified_since = environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since is None:
+                return False
+            return static.mtime <= since.timestamp()
+        return False
@@ -0,0 +1,17 @@
+from django import template
+
+from .. import fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def personal(context, template_name, **kwargs):
+    """Фрагмент, зависящий от пользователя (см. core.fragments).
+
+    В ``kwargs`` - только значения, которые сериализуются в JSON.
+    """
+    request = context['request']
+    if fragments.is_shared(request):
+        return fragments.marker(template_name, kwargs)
+    return fragments.render(request, template_name, kwargs)
@@ -1,4 +1,31 @@
-from django.test import TestCase
+import gzip
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.template import engines
+from django.templatetags.static import static
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import Http404
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from . import media, profiling, routing
+from .bench import WSGIDriver, compare
+from .cache_backends import SQLiteCache
+from .static import SHORT, StaticFiles
+from .warmup import template_names, warm_templates
 
 
 class ViewTestClass(TestCase):
@@ -6,3 +33,490 @@ class ViewTestClass(TestCase):
         response = self.client.get('/unexisting_page/')
         self.assertEqual(response.status_code, 404)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        profiling.clear()
+
+    def test_record_and_server_timing(self):
+        response = self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        first, second = profiling.records()
+        self.assertEqual(first['view'], 'posts:index')
+        self.assertEqual(first['status'], 200)
+        self.assertGreater(first['queries'], 0)
+        self.assertGreater(first['template_ms'], 0)
+        self.assertEqual(first['size'], len(response.content))
+        # Второй раз страница целиком берётся из кэша.
+        self.assertEqual(second['cache_misses'], 0)
+        self.assertGreater(second['cache_hits'], 0)
+        self.assertLess(second['queries'], first['queries'])
+        self.assertIn(
+            f"db;dur={first['sql_ms']};desc=\"{first['queries']} queries\"",
+            response['Server-Timing'],
+        )
+        summary, = profiling.summary()
+        self.assertEqual(summary['requests'], 2)
+        self.assertEqual(summary['max_queries'], first['queries'])
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 1})
+    def test_budget(self):
+        with self.assertLogs('core.middleware', 'WARNING'):
+            self.client.get(reverse('posts:index'))
+        with override_settings(QUERY_BUDGET_ERRORS=True):
+            cache.clear()
+            with self.assertRaises(profiling.QueryBudgetExceeded):
+                self.client.get(reverse('posts:index'))
+
+    def test_dashboard_for_staff_only(self):
+        url = reverse('profiling')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        admin = get_user_model().objects.create_user(
+            username='admin', is_staff=True
+        )
+        self.client.force_login(admin)
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(url)
+        self.assertContains(response, 'posts:index')
+
+
+class BenchTests(TestCase):
+    def test_compare(self):
+        baseline = {
+            'index': {'count': 10, 'p50_ms': 2.0, 'p99_ms': 5.0},
+            'profile': {'count': 10, 'p50_ms': 4.0, 'p99_ms': 8.0},
+        }
+        current = {
+            'index': {'count': 10, 'p50_ms': 2.1, 'p99_ms': 9.0},
+            'profile': {'count': 0},
+            'search': {'count': 10, 'p50_ms': 1.0, 'p99_ms': 2.0},
+        }
+        self.assertEqual(
+            compare(baseline, current, 0.2),
+            [('index', 'p99_ms', 5.0, 9.0)],
+        )
+
+    def test_wsgi_driver(self):
+        driver = WSGIDriver()
+        self.assertEqual(driver.request('GET', reverse('posts:index')), 200)
+        user = get_user_model().objects.create_user(username='author')
+        self.client.force_login(user)
+        cookies = {'sessionid': self.client.cookies['sessionid'].value}
+        request = RequestFactory().get('/')
+        token = get_token(request)
+        url = reverse('posts:create_post')
+        # Без токена CSRF пост не создаётся.
+        driver.request('POST', url, {'text': 'Без токена'}, cookies)
+        self.assertFalse(user.posts.exists())
+        cookies['csrftoken'] = request.META['CSRF_COOKIE']
+        status = driver.request(
+            'POST', url, {'text': 'С токеном'}, cookies,
+            {'HTTP_X_CSRFTOKEN': token},
+        )
+        self.assertEqual(status, 302)
+        self.assertEqual(user.posts.get().text, 'С токеном')
+        samples, errors, wall = driver.run(
+            [{'method': 'GET', 'path': '/unexisting_page/'}] * 3
+        )
+        self.assertEqual((samples, errors), ([], 3))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class RoutingTests(TestCase):
+    def read_alias(self, request):
+        return router.db_for_read(Post)
+
+    def test_replica_only_for_safe_methods_of_marked_views(self):
+        view = routing.use_replica(self.read_alias)
+        factory = RequestFactory()
+        self.assertEqual(view(factory.get('/')), 'replica')
+        self.assertEqual(view(factory.post('/')), 'default')
+        self.assertEqual(self.read_alias(factory.get('/')), 'default')
+        self.assertEqual(router.db_for_write(Post), 'default')
+        with routing.request_scope(pinned=True):
+            self.assertEqual(view(factory.get('/')), 'default')
+
+    def test_pin_after_write(self):
+        user = get_user_model().objects.create_user(username='author')
+        post = Post.objects.create(author=user, text='Текст')
+        self.client.force_login(user)
+        url = reverse('posts:add_comment', args=[post.pk])
+        response = self.client.post(url, {'text': ''})
+        self.assertNotIn('pin_primary', response.cookies)
+        response = self.client.post(url, {'text': 'Комментарий'})
+        self.assertIn('pin_primary', response.cookies)
+        # С кукой лента читается из default.
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Текст')
+
+    def test_copy_database(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        source = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory, 'db.sqlite3'),
+        })
+        self.addCleanup(source.close)
+        with source.cursor() as cursor:
+            cursor.execute('CREATE TABLE post (text TEXT)')
+            cursor.execute("INSERT INTO post VALUES ('Текст')")
+        path = os.path.join(directory, 'replica.sqlite3')
+        routing.copy_database(source, path)
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('SELECT text FROM post').fetchall(),
+            [('Текст',)],
+        )
+
+
+class WarmupTests(TestCase):
+    def test_compiles_all_templates_with_cached_loader(self):
+        templates = import_module('yatube.settings_production').TEMPLATES
+        with override_settings(TEMPLATES=templates):
+            directory = templates[0]['DIRS'][0]
+            names = list(template_names(directory))
+            self.assertIn('includes/header.html', names)
+            self.assertEqual(warm_templates(), len(names))
+            loader = engines['django'].engine.template_loaders[0]
+            self.assertIn('base.html', loader.get_template_cache)
+
+    def test_nothing_to_do_without_cached_loader(self):
+        # Как при DEBUG: без явных loaders кэша нет.
+        templates = [{
+            **settings.TEMPLATES[0],
+            'OPTIONS': {**settings.TEMPLATES[0]['OPTIONS'], 'debug': True},
+        }]
+        with override_settings(TEMPLATES=templates):
+            self.assertEqual(warm_templates(), 0)
+
+
+class SQLitePragmaTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def query(self, sql):
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(self.directory, 'db.sqlite3'),
+        })
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute(sql)
+                return cursor.fetchone()[0]
+        finally:
+            wrapper.close()
+
+    def test_pragmas_on_new_connection(self):
+        with override_settings(SQLITE_PRAGMAS={
+            'busy_timeout': 1234, 'journal_mode': 'WAL',
+        }):
+            self.assertEqual(self.query('PRAGMA busy_timeout'), 1234)
+            self.assertEqual(self.query('PRAGMA journal_mode'), 'wal')
+
+    def test_no_pragmas_by_default(self):
+        self.assertEqual(self.query('PRAGMA journal_mode'), 'delete')
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        self.cache.set('key', {'value': 1})
+        self.assertEqual(self.cache.get('key'), {'value': 1})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertTrue(self.cache.add('new', 'value'))
+        self.assertEqual(
+            self.cache.get_many(['key', 'new', 'missing']),
+            {'key': {'value': 1}, 'new': 'value'},
+        )
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.has_key('new'))
+        self.cache.clear()
+        self.assertFalse(self.cache.has_key('new'))
+
+    def test_expiry(self):
+        self.cache.set('key', 'value', timeout=0)
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 'value', timeout=None)
+        self.assertTrue(self.cache.touch('key', timeout=0))
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_incr(self):
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_shared_between_processes(self):
+        self.cache.set('counter', 0, timeout=None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_lru_eviction_by_entries(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2,
+                                ACCESS_RESOLUTION=0)
+        for idx in range(10):
+            cache.set(f'key{idx}', idx)
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertEqual(cache.get('key0'), 0)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get('key10'), 10)
+
+    def test_eviction_by_size(self):
+        cache = self.make_cache(MAX_SIZE=10 * 1024)
+        for idx in range(20):
+            cache.set(f'key{idx}', b'x' * 1024)
+        size = sum(
+            len(value) for value in cache.get_many(
+                [f'key{idx}' for idx in range(20)]
+            ).values()
+        )
+        self.assertLessEqual(size, 10 * 1024)
+        self.assertEqual(cache.get('key19'), b'x' * 1024)
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class StaticFilesTests(TestCase):
+    def setUp(self):
+        self.source = tempfile.mkdtemp()
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.source, 'css'))
+        with open(os.path.join(self.source, 'css', 'app.css'), 'w') as css:
+            css.write('body { color: black; }\n' * 200)
+        with open(os.path.join(self.source, 'logo.png'), 'wb') as png:
+            png.write(os.urandom(512))
+        self.settings = override_settings(
+            STATICFILES_DIRS=[self.source],
+            STATICFILES_FINDERS=[
+                'django.contrib.staticfiles.finders.FileSystemFinder',
+            ],
+            STATIC_ROOT=self.root,
+            STATICFILES_STORAGE='core.static.CompressedManifestStorage',
+        )
+        self.settings.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        self.app_calls = []
+        self.server = StaticFiles(self.app)
+        self.hashed = static('css/app.css')
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.source)
+        shutil.rmtree(self.root)
+
+    def app(self, environ, start_response):
+        self.app_calls.append(environ['PATH_INFO'])
+        start_response('404 Not Found', [])
+        return [b'']
+
+    def get(self, path, method='GET', **headers):
+        environ = {'REQUEST_METHOD': method, 'PATH_INFO': path, **headers}
+        result = {}
+
+        def start_response(status, headers):
+            result['status'] = status
+            result['headers'] = dict(headers)
+
+        body = b''.join(self.server(environ, start_response))
+        return result['status'], result['headers'], body
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        self.assertRegex(self.hashed, r'^/static/css/app\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, self.hashed[len('/static/'):])
+        with open(path, 'rb') as original, open(path + '.gz', 'rb') as gz:
+            self.assertEqual(gzip.decompress(gz.read()), original.read())
+        # Случайные байты не сжимаются: копии нет.
+        self.assertFalse(os.path.exists(
+            os.path.join(self.root, 'logo.png.gz')
+        ))
+
+    def test_serves_compressed_hashed_file_as_immutable(self):
+        status, headers, body = self.get(
+            self.hashed, HTTP_ACCEPT_ENCODING='gzip, deflate'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(headers['Content-Type'], 'text/css')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertIn(b'color: black', gzip.decompress(body))
+
+    def test_identity_and_short_cache_for_unhashed_file(self):
+        status, headers, body = self.get(
+            '/static/css/app.css', HTTP_ACCEPT_ENCODING='gzip;q=0'
+        )
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertNotIn('immutable', headers['Cache-Control'])
+        self.assertTrue(body.startswith(b'body { color: black; }'))
+
+    def test_not_modified_and_head(self):
+        _, headers, _ = self.get(self.hashed, HTTP_ACCEPT_ENCODING='gzip')
+        status, _, body = self.get(
+            self.hashed, HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=headers['ETag'],
+        )
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+        status, headers, body = self.get(self.hashed, method='HEAD')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body, b'')
+        self.assertGreater(int(headers['Content-Length']), 0)
+        status, _, _ = self.get(self.hashed, method='POST')
+        self.assertEqual(status, '405 Method Not Allowed')
+
+    def test_other_paths_go_to_application(self):
+        self.get('/static/missing.css')
+        self.get('/')
+        self.assertEqual(self.app_calls, ['/static/missing.css', '/'])
+
+    def test_missing_asset_keeps_plain_url(self):
+        name = 'bootstrap/dist/css/bootstrap.min.css'
+        with self.assertLogs('core.static', 'WARNING') as logs:
+            self.assertEqual(static(name), '/static/' + name)
+            static(name)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn(name, logs.output[0])
+        # Положенный в STATIC_ROOT руками файл без хэша не кэшируется
+        # на год.
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as css:
+            css.write('body {}')
+        self.server = StaticFiles(self.app)
+        status, headers, _ = self.get('/static/' + name)
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Cache-Control'], SHORT)
+
+
+class MediaServeTests(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.data = bytes(range(256)) * 4
+        for name in ('posts/photo.webp', 'cache/ab/cd/thumb.jpg',
+                     'export/posts.csv'):
+            path = os.path.join(self.root, name)
+            os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as file:
+                file.write(self.data)
+        self.settings = override_settings(MEDIA_ROOT=self.root)
+        self.settings.enable()
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.root)
+
+    def get(self, path, **headers):
+        request = self.factory.get('/media/' + path, **headers)
+        response = media.serve(request, path)
+        body = b''.join(getattr(response, 'streaming_content', [])) or (
+            response.content if not response.streaming else b''
+        )
+        response.close()
+        return response, body
+
+    def test_whole_file(self):
+        response, body = self.get('posts/photo.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_thumbnails_are_immutable(self):
+        response, _ = self.get('cache/ab/cd/thumb.jpg')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_ranges(self):
+        for header, start, end in (
+            ('bytes=10-19', 10, 19),
+            ('bytes=1000-', 1000, 1023),
+            ('bytes=-4', 1020, 1023),
+            ('bytes=1020-5000', 1020, 1023),
+        ):
+            with self.subTest(range=header):
+                response, body = self.get(
+                    'posts/photo.webp', HTTP_RANGE=header
+                )
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body, self.data[start:end + 1])
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/1024'
+                )
+                self.assertEqual(response['Content-Length'], str(len(body)))
+
+    def test_unsatisfiable_and_unsupported_ranges(self):
+        response, _ = self.get('posts/photo.webp', HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        response, body = self.get(
+            'posts/photo.webp', HTTP_RANGE='bytes=0-1,5-6'
+        )
+        self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_conditional_requests(self):
+        response, _ = self.get('posts/photo.webp')
+        etag = response['ETag']
+        response, _ = self.get('posts/photo.webp', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        response, _ = self.get(
+            'posts/photo.webp', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag
+        )
+        self.assertEqual(response.status_code, 206)
+        response, body = self.get(
+            'posts/photo.webp', HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"'
+        )
+        self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_only_served_directories(self):
+        for path in ('export/posts.csv', 'posts/missing.webp',
+                     'posts/../export/posts.csv', 'posts'):
+            with self.subTest(path=path):
+                with self.assertRaises(Http404):
+                    self.get(path)
+
+    def test_offload_to_proxy(self):
+        with override_settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response, body = self.get('posts/photo.webp')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/photo.webp'
+        )
+        self.assertEqual(body, b'')
+        with override_settings(MEDIA_OFFLOAD='x-sendfile'):
+            response, _ = self.get('posts/photo.webp')
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(self.root, 'posts', 'photo.webp'),
+        )
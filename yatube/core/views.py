@@ -1,5 +1,8 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render
 
+from . import profiling
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +18,11 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+def profiling_dashboard(request):
+    return render(request, 'core/profiling.html', {
+        'summary': profiling.summary(),
+        'recent': profiling.records()[-50:][::-1],
+    })
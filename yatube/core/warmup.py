@@ -0,0 +1,63 @@
+"""Компиляция шаблонов при старте воркера.
+
+С кэширующим загрузчиком (settings_production) шаблон разбирается
+один раз на процесс, но этот раз приходится на первый запрос к
+странице, а base.html и include - на первый запрос вообще.
+warm_templates() загружает все шаблоны из DIRS заранее.
+"""
+import logging
+import os
+from functools import lru_cache
+
+from django.template import TemplateSyntaxError, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.loaders.cached import Loader as CachedLoader
+
+logger = logging.getLogger(__name__)
+
+
+def template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if name.endswith(('.html', '.txt')):
+                path = os.path.relpath(os.path.join(root, name), directory)
+                yield path.replace(os.sep, '/')
+
+
+@lru_cache(maxsize=None)
+def templates_stamp():
+    """Время последней правки шаблонов DIRS; считается раз на процесс."""
+    stamp = 0
+    for backend in engines.all():
+        for directory in getattr(backend, 'dirs', ()):
+            for name in template_names(directory):
+                stamp = max(stamp, os.path.getmtime(
+                    os.path.join(directory, name)
+                ))
+    return stamp
+
+
+def warm_templates():
+    """Загружает шаблоны в кэширующие загрузчики; возвращает их число.
+
+    Без кэширующего загрузчика (DEBUG) делать нечего: шаблон всё равно
+    разбирается на каждом запросе.
+    """
+    count = 0
+    for backend in engines.all():
+        if not isinstance(backend, DjangoTemplates):
+            continue
+        engine = backend.engine
+        if not any(isinstance(loader, CachedLoader)
+                   for loader in engine.template_loaders):
+            continue
+        for directory in engine.dirs:
+            for name in sorted(template_names(directory)):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    # Сломанный шаблон уронит свою страницу, но не воркер.
+                    logger.exception('Шаблон %s не компилируется', name)
+                    continue
+                count += 1
+    return count
@@ -1,14 +1,55 @@
 from django.contrib import admin
 
-from .models import Group, Post
+from . import export, search
+from .models import Comment, Follow, Group, Post
+from .paginators import CachedCountPaginator
+
+
+def export_action(table, fmt):
+    """Действие админки: потоковая выгрузка выбранных строк."""
+    def action(modeladmin, request, queryset):
+        return export.response(table, fmt, queryset=queryset)
+
+    action.__name__ = f'export_{fmt}'
+    action.short_description = f'Выгрузить выбранные в {fmt.upper()}'
+    return action
+
+
+# Самые релевантные находки поиска в админке: их pk уходят в IN (...),
+# а у SQLite лимит на число параметров запроса.
+SEARCH_LIMIT = 500
+
+
+class CountCachingAdmin(admin.ModelAdmin):
+    """Списки больших таблиц без COUNT(*) на каждое открытие."""
+
+    paginator = CachedCountPaginator
+    # Иначе рядом с отфильтрованным числом считается ещё и полное.
+    show_full_result_count = False
+
+
+EXPORT_ACTIONS = {
+    table: [export_action(table, fmt) for fmt in export.FORMATS]
+    for table in export.TABLES
+}
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(CountCachingAdmin):
     list_display = ('text', 'pub_date', 'author')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = EXPORT_ACTIONS['posts']
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу вместо LIKE '%...%' по всей таблице.
+        if not search_term:
+            return queryset, False
+        post_ids = [
+            pk for _, pk in search.search(search_term, limit=SEARCH_LIMIT)
+        ]
+        return queryset.filter(pk__in=post_ids), False
 
 
 @admin.register(Group)
@@ -17,3 +58,19 @@ class GroupAdmin(admin.ModelAdmin):
     search_fields = ('title',)
     list_filter = ('title',)
     empty_value_display = '-пусто-'
+
+
+@admin.register(Comment)
+class CommentAdmin(CountCachingAdmin):
+    list_display = ('text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    raw_id_fields = ('post', 'author')
+    actions = EXPORT_ACTIONS['comments']
+
+
+@admin.register(Follow)
+class FollowAdmin(CountCachingAdmin):
+    list_display = ('user', 'author', 'follow_time')
+    list_select_related = ('user', 'author')
+    raw_id_fields = ('user', 'author')
+    actions = EXPORT_ACTIONS['follows']
@@ -0,0 +1,120 @@
+"""JSON API лент только для чтения.
+
+Ленты строятся теми же запросами (PostQuerySet) и листаются тем же
+KeysetPaginator, что и HTML-страницы. Ответы поддерживают условные
+GET (conditional.py): неизменившаяся лента отвечает 304 без выборки
+и сериализации.
+"""
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from .conditional import (
+    conditional, follow_keys, get_post, group_keys, index_keys, post_keys,
+    profile_keys,
+)
+from .models import Comment, Group, Post, User
+from .paginators import COMMENTS_ORDERING, KeysetPaginator, get_page_obj
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def serialize_post(post, author=None, group=None):
+    """Пост ленты; author/group подставляются, если их не выбирали."""
+    author = author or post.author
+    if group is None and post.group_id:
+        group = post.group
+    thumbnail = post.thumbnail('card') if post.image else None
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': author.username,
+        'group': group.slug if group else None,
+        'image': post.image.url if post.image else None,
+        'thumbnail': thumbnail[0] if thumbnail else None,
+        'comments_count': post.comments_count,
+    }
+
+
+def serialize_comment(comment):
+    return {
+        'id': comment.pk,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
+
+
+def page_links(request, page):
+    links = {}
+    for name, query in (('next', getattr(page, 'next_query', None)),
+                        ('previous', getattr(page, 'previous_query', None))):
+        links[name] = query and f'{request.path}?{query}'
+    return links
+
+
+def feed_response(request, queryset, **overrides):
+    page = get_page_obj(request, queryset)
+    return JsonResponse({
+        'results': [serialize_post(post, **overrides) for post in page],
+        **page_links(request, page),
+    }, json_dumps_params=JSON_PARAMS)
+
+
+@require_safe
+@conditional(index_keys)
+def index(request):
+    return feed_response(request, Post.objects.index_feed())
+
+
+@require_safe
+@conditional(group_keys)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, Post.objects.group_feed(group),
+                         group=group)
+
+
+@require_safe
+@conditional(profile_keys)
+def profile(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, Post.objects.author_feed(author),
+                         author=author)
+
+
+@require_safe
+@conditional(follow_keys)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return JsonResponse(
+            {'detail': 'Нужно войти'}, status=401,
+            json_dumps_params=JSON_PARAMS,
+        )
+    return feed_response(request, Post.objects.follow_feed(request.user))
+
+
+@require_safe
+@conditional(post_keys)
+def post_detail(request, post_id):
+    post = get_post(request, post_id)
+    if post is None:
+        raise Http404
+    comments = Comment.objects.filter(post=post).select_related(
+        'author'
+    ).only('text', 'created', 'author', 'author__username')
+    # Комментарии листаются так же, как на странице поста: ?page= и
+    # дальше ?cursor=, ссылки next/previous - на их страницы.
+    paginator = KeysetPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ordering=COMMENTS_ORDERING,
+        count=post.comments_count,
+    )
+    page = paginator.get_page(
+        request.GET.get('page'), request.GET.get('cursor')
+    )
+    data = serialize_post(post)
+    data['comments'] = [serialize_comment(comment) for comment in page]
+    data.update(page_links(request, page))
+    return JsonResponse(data, json_dumps_params=JSON_PARAMS)
@@ -0,0 +1,119 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from core import fragments, routing
+
+VERSION_PREFIX = 'version:'
+
+
+def index_key():
+    return 'feed:index'
+
+
+def group_key(group_id):
+    return f'feed:group:{group_id}'
+
+
+def profile_key(user_id):
+    return f'feed:profile:{user_id}'
+
+
+def post_key(post_id):
+    return f'post:{post_id}'
+
+
+def _new_version():
+    # Не с единицы: после вытеснения счётчика из кэша старые записи
+    # с маленькими номерами версий не должны ожить.
+    return time.time_ns()
+
+
+def get_versions(keys):
+    """Текущие версии ключей, недостающие заводятся заново."""
+    names = [VERSION_PREFIX + key for key in keys]
+    found = cache.get_many(names)
+    for name in names:
+        if name not in found:
+            cache.add(name, _new_version(), None)
+            found[name] = cache.get(name)
+    return [found[name] for name in names]
+
+
+def bump(*keys):
+    for key in keys:
+        try:
+            cache.incr(VERSION_PREFIX + key)
+        except ValueError:
+            cache.set(VERSION_PREFIX + key, _new_version(), None)
+
+
+def attach_versions(posts):
+    """Проставляет постам cache_version для кэша карточек в шаблонах."""
+    posts = list(posts)
+    versions = get_versions([post_key(post.pk) for post in posts])
+    for post, version in zip(posts, versions):
+        post.cache_version = version
+    return posts
+
+
+def page_cache_key(request, versions):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    version = '.'.join(str(value) for value in versions)
+    return f'feed-page:{path}:{version}'
+
+
+def cache_feed(*key_funcs):
+    """Кэширует страницу ленты до смены версии показанных на ней данных.
+
+    Страница в кэше одна на всех пользователей: всё личное на ней -
+    фрагменты core.fragments, они дорисовываются к каждому ответу.
+    ``key_funcs`` получают запрос и аргументы вьюхи и возвращают ключ
+    версии или None, если кэшировать нечего (например, будет 404).
+
+    С репликами (core.routing) страница могла быть нарисована по
+    отставшей реплике уже под новой версией. Поэтому клиент, который
+    только что писал, кэш не читает и рисует страницу из default, а
+    страница с реплики хранится не дольше REPLICA_PIN_SECONDS.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            keys = [func(request, **kwargs) for func in key_funcs]
+            if None in keys:
+                return view(request, *args, **kwargs)
+            cache_key = page_cache_key(request, get_versions(keys))
+            cached = None if routing.is_pinned() else cache.get(cache_key)
+            if cached is None:
+                csrf_used = request.META.get('CSRF_COOKIE_USED')
+                with fragments.shared(request):
+                    response = view(request, *args, **kwargs)
+                # CSRF-токен вне фрагмента - личное в общей странице.
+                personal = not csrf_used and request.META.get(
+                    'CSRF_COOKIE_USED'
+                )
+                if response.status_code != 200 or response.streaming or (
+                    personal
+                ):
+                    if not response.streaming:
+                        response.content = fragments.stitch(
+                            request, response.content
+                        )
+                    return response
+                cached = (response.content, response['Content-Type'])
+                timeout = settings.FEED_CACHE_TIMEOUT
+                if routing.reads_from_replica():
+                    timeout = min(timeout, settings.REPLICA_PIN_SECONDS)
+                cache.set(cache_key, cached, timeout)
+            content, content_type = cached
+            return HttpResponse(
+                fragments.stitch(request, content), content_type=content_type
+            )
+        return wrapper
+    return decorator
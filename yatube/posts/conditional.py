@@ -0,0 +1,119 @@
+"""Условные GET для лент и страниц постов.
+
+ETag собирается из версий данных (cache.py) и того, кто смотрит:
+версии меняются при каждой правке показанных данных. Совпал ETag -
+ответ 304 без выборки ленты и без шаблона. pk группы или автора
+ищется один раз на запрос: тот же запрос нужен и ключу кэша страницы.
+"""
+import hashlib
+
+from django.conf import settings
+from django.views.decorators.http import condition
+
+from core import routing
+from core.warmup import templates_stamp
+
+from . import cache
+from .models import Group, Post, User
+
+
+def remember(request, key, func):
+    """Значение func(), посчитанное один раз за запрос."""
+    if not hasattr(request, '_conditional_cache'):
+        request._conditional_cache = {}
+    if key not in request._conditional_cache:
+        request._conditional_cache[key] = func()
+    return request._conditional_cache[key]
+
+
+def group_id(request, slug):
+    return remember(request, ('group', slug), lambda: Group.objects.filter(
+        slug=slug
+    ).values_list('pk', flat=True).first())
+
+
+def user_id(request, username):
+    return remember(request, ('user', username), lambda: User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first())
+
+
+def get_post(request, post_id):
+    """Пост со страницы или из API: ETag и вьюха читают его одним
+    запросом."""
+    return remember(request, ('post', post_id), lambda: Post.objects.filter(
+        pk=post_id
+    ).select_related('author', 'group').first())
+
+
+def conditional(keys_func, pages=False):
+    """ETag для вьюхи.
+
+    ``keys_func`` получает запрос и аргументы вьюхи и возвращает ключи
+    версий или None, если объекта нет: тогда заголовков не будет, а
+    вьюха сама ответит ошибкой.
+
+    Last-Modified не отдаётся: дата свежайшего поста не знает ни о
+    правках, ни о подписках, ни о том, кто смотрит, и по одному
+    If-Modified-Since клиент получал бы 304 на устаревший ответ. В ETag
+    HTML-страниц (``pages``) входят ещё штамп шаблонов, чтобы после
+    выкладки новой разметки браузер не получил 304 на старую, и
+    CSRF-кука: после нового входа страница с формой должна прийти с
+    новым токеном.
+
+    Страница с отстающей реплики (core.routing) ETag не получает: версии
+    уже новые, а данные ещё старые, и браузер держал бы по 304 устаревшую
+    страницу до следующей правки.
+    """
+    def etag(request, **kwargs):
+        if routing.reads_from_replica():
+            return None
+        keys = keys_func(request, **kwargs)
+        if keys is None:
+            return None
+        parts = [request.get_full_path(), str(request.user.pk)]
+        if pages:
+            parts += [
+                str(templates_stamp()),
+                request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+            ]
+        parts += [str(version) for version in cache.get_versions(keys)]
+        return hashlib.md5('|'.join(parts).encode()).hexdigest()
+
+    return condition(etag_func=etag)
+
+
+def index_keys(request):
+    return [cache.index_key()]
+
+
+def group_keys(request, slug):
+    found = group_id(request, slug)
+    return found and [cache.group_key(found)]
+
+
+def profile_keys(request, username):
+    found = user_id(request, username)
+    return found and [cache.profile_key(found)]
+
+
+def follow_keys(request):
+    if not request.user.is_authenticated:
+        return None
+    # Своей версии у ленты подписок нет: правки постов меняют версию
+    # главной, подписки и отписки - версию профиля читателя.
+    return [cache.index_key(), cache.profile_key(request.user.pk)]
+
+
+def post_keys(request, post_id):
+    post = get_post(request, post_id)
+    return post and [cache.post_key(post.pk)]
+
+
+def post_page_keys(request, post_id):
+    """Страница поста показывает ещё и число постов автора: его меняет
+    версия профиля."""
+    post = get_post(request, post_id)
+    if post is None:
+        return None
+    return [cache.post_key(post.pk), cache.profile_key(post.author_id)]
@@ -0,0 +1,85 @@
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps as django_apps
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def bump(queryset, **deltas):
+    """Атомарно сдвигает счётчики: UPDATE ... SET field = field + delta."""
+    return queryset.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+
+
+def bump_many(queryset, field, deltas, key='pk'):
+    """Сдвигает ``field`` у многих строк на разные величины.
+
+    ``deltas`` - {значение key: сдвиг}. Строки с одинаковым сдвигом
+    обновляются одним UPDATE, а сдвигов в пачке обычно немного.
+    """
+    by_delta = defaultdict(list)
+    for value, delta in deltas.items():
+        by_delta[delta].append(value)
+    for delta, values in by_delta.items():
+        bump(queryset.filter(**{f'{key}__in': values}), **{field: delta})
+
+
+def bump_user(user_id, **deltas):
+    UserStats = django_apps.get_model('posts', 'UserStats')
+    updated = bump(UserStats.objects.filter(user_id=user_id), **deltas)
+    if not updated and min(deltas.values()) > 0:
+        # Строки ещё нет: заводим её сразу с настоящими значениями,
+        # они уже учитывают текущее изменение. При уменьшении не
+        # заводим: пользователя могут удалять каскадом прямо сейчас.
+        UserStats.objects.get_or_create(
+            user_id=user_id, defaults=UserStats.actual_counts(user_id)
+        )
+
+
+def _count(model, field):
+    rows = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(rows), 0)
+
+
+def rebuild(apps=django_apps):
+    """Пересчитывает все счётчики целиком, по UPDATE на таблицу."""
+    User = apps.get_model('auth', 'User')
+    Group = apps.get_model('posts', 'Group')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    missing = (
+        User.objects.filter(stats__isnull=True)
+        .values_list('pk', flat=True)
+        .iterator(chunk_size=REBUILD_BATCH_SIZE)
+    )
+    while True:
+        chunk = list(islice(missing, REBUILD_BATCH_SIZE))
+        if not chunk:
+            break
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk) for pk in chunk], ignore_conflicts=True
+        )
+    return {
+        'groups': Group.objects.update(posts_count=_count(Post, 'group')),
+        'posts': Post.objects.update(
+            comments_count=_count(Comment, 'post')
+        ),
+        'users': UserStats.objects.update(
+            posts_count=_count(Post, 'author'),
+            followers_count=_count(Follow, 'author'),
+            following_count=_count(Follow, 'user'),
+        ),
+    }
@@ -0,0 +1,144 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Строки читаются через iterator(chunk_size=...) прямо из values_list,
+без моделей, и сразу кодируются в NDJSON или CSV (по желанию - в
+gzip). В памяти одновременно одна пачка строк и один блок вывода,
+сколько бы строк ни было в таблице.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from .models import Comment, Follow, Post
+
+# Колонка выгрузки -> поле для values_list
+TABLES = {
+    'posts': (Post, (
+        ('id', 'pk'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('pub_date', 'pub_date'),
+        ('text', 'text'),
+        ('image', 'image'),
+        ('comments_count', 'comments_count'),
+    )),
+    'comments': (Comment, (
+        ('id', 'pk'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('created', 'created'),
+        ('text', 'text'),
+    )),
+    'follows': (Follow, (
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+        ('follow_time', 'follow_time'),
+    )),
+}
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# Сколько байт копится перед отправкой: без этого каждая строка
+# превращается в отдельный кусок ответа или блок gzip.
+BLOCK_SIZE = 64 * 1024
+
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def rows(table, queryset=None, chunk_size=None):
+    """Кортежи значений колонок таблицы ``table`` по возрастанию pk."""
+    model, columns = TABLES[table]
+    if queryset is None:
+        queryset = model.objects.all()
+    values = queryset.order_by('pk').values_list(
+        *(field for _, field in columns)
+    )
+    for row in values.iterator(
+        chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE
+    ):
+        yield tuple(map(_value, row))
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps(
+            dict(zip(columns, row)), ensure_ascii=False,
+            separators=(',', ':'),
+        ) + '\n'
+
+
+class _Echo:
+    """csv.writer пишет сюда и сразу получает строку обратно."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value
+                               for value in row])
+
+
+def encode(lines, compress=False):
+    """Блоки байтов до BLOCK_SIZE; с ``compress`` - поток gzip."""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    block, size = [], 0
+    for line in lines:
+        data = line.encode()
+        block.append(data)
+        size += len(data)
+        if size < BLOCK_SIZE:
+            continue
+        data, block, size = b''.join(block), [], 0
+        data = compressor.compress(data) if compressor else data
+        if data:
+            yield data
+    data = b''.join(block)
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+
+def stream(table, fmt='ndjson', compress=False, queryset=None,
+           chunk_size=None):
+    """Байты выгрузки таблицы: годится и для файла, и для
+    StreamingHttpResponse."""
+    columns = [name for name, _ in TABLES[table][1]]
+    lines = ndjson_lines if fmt == 'ndjson' else csv_lines
+    return encode(
+        lines(columns, rows(table, queryset, chunk_size)), compress
+    )
+
+
+def filename(table, fmt, compress=False):
+    name = f'{table}.{FORMATS[fmt][1]}'
+    return f'{name}.gz' if compress else name
+
+
+def response(table, fmt='ndjson', compress=False, queryset=None,
+             name=None):
+    """Скачивание выгрузки: ответ отдаётся по мере чтения строк."""
+    if compress:
+        content_type = 'application/gzip'
+    else:
+        content_type = f'{FORMATS[fmt][0]}; charset=utf-8'
+    result = StreamingHttpResponse(
+        stream(table, fmt, compress, queryset), content_type=content_type
+    )
+    result['Content-Disposition'] = (
+        f'attachment; filename="{filename(name or table, fmt, compress)}"'
+    )
+    return result
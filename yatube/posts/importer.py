@@ -0,0 +1,266 @@
+"""Пакетный импорт постов и комментариев из NDJSON или CSV.
+
+Строки в том же виде, что отдаёт выгрузка (export.py): автор - по
+username, группа - по slug, комментарий ссылается на id поста. Файл
+читается потоком, строки пишутся bulk_create пачками, каждая пачка -
+одна транзакция. Сигналы bulk_create не шлёт, поэтому счётчики,
+ленты подписок, индекс поиска и версии кэша обновляются после вставки
+пачки, разом на всю пачку.
+"""
+import csv
+import gzip
+import json
+from abc import ABC, abstractmethod
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db import NotSupportedError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, search, timelines
+from .models import Comment, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def open_rows(path):
+    """Словари строк файла; формат по расширению, .gz распаковывается."""
+    name = path[:-3] if path.endswith('.gz') else path
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as file:
+        if name.endswith('.csv'):
+            for row in csv.DictReader(file):
+                yield {key: value or None for key, value in row.items()}
+        else:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+class Lookup:
+    """Кэш «значение поля -> pk»: недостающие ключи пачки добираются
+    одним запросом, а с ``create`` - создаются."""
+
+    def __init__(self, model, field, create=None):
+        self.model = model
+        self.field = field
+        self.create = create
+        self.ids = {}
+
+    def _fetch(self, values):
+        self.ids.update(self.model.objects.filter(
+            **{f'{self.field}__in': values}
+        ).values_list(self.field, 'pk'))
+
+    def resolve(self, values):
+        missing = list({value for value in values if value} - set(self.ids))
+        if missing:
+            self._fetch(missing)
+            missing = [value for value in missing if value not in self.ids]
+            if missing and self.create:
+                self.model.objects.bulk_create(
+                    [self.create(value) for value in missing],
+                    ignore_conflicts=True,
+                )
+                self._fetch(missing)
+        return self.ids
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(value)
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def _id(row, keep_ids):
+    return int(row['id']) if keep_ids and row.get('id') else None
+
+
+def _after_commit(*keys):
+    transaction.on_commit(lambda: cache.bump(*keys))
+
+
+def assign_ids(objects):
+    """Проставляет pk новым объектам внутри транзакции пачки: по ним
+    пачке возвращаются даты и обновляются ленты и поиск.
+
+    В SQLite диапазон занимается в sqlite_sequence: эта запись берёт
+    блокировку базы до коммита, так что пост с сайта в это время ждёт
+    и получает pk после диапазона. Там, где bulk_create возвращает pk,
+    их назначает сама база.
+    """
+    new = [obj for obj in objects if obj.pk is None]
+    if not new or connection.features.can_return_ids_from_bulk_insert:
+        return
+    if connection.vendor != 'sqlite':
+        raise NotSupportedError('--new-ids: база не возвращает pk')
+    table = type(new[0])._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'UPDATE sqlite_sequence SET seq = seq + %s WHERE name = %s',
+            [len(new), table],
+        )
+        if not cursor.rowcount:
+            # В таблицу ещё ни разу не вставляли.
+            cursor.execute(
+                'INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)',
+                [table, len(new)],
+            )
+        cursor.execute(
+            'SELECT seq FROM sqlite_sequence WHERE name = %s', [table]
+        )
+        first = cursor.fetchone()[0] - len(new) + 1
+    for offset, obj in enumerate(new):
+        obj.pk = first + offset
+
+
+class Importer(ABC):
+    model = None
+    date_field = None
+
+    def __init__(self, create_missing=False, keep_ids=True):
+        self.keep_ids = keep_ids
+        self.authors = Lookup(User, 'username', create_missing and (
+            lambda username: User(username=username, password='!')
+        ))
+
+    @abstractmethod
+    def build(self, rows):
+        """Объекты пачки и число отброшенных строк."""
+
+    @abstractmethod
+    def maintain(self, objects):
+        """Производные данные пачки: то, что сделали бы сигналы."""
+
+    def drop_existing(self, objects):
+        # Повторный запуск без контрольной точки не дублирует строки.
+        ids = [obj.pk for obj in objects if obj.pk]
+        existing = set(self.model.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True
+        ))
+        return [obj for obj in objects if obj.pk not in existing]
+
+    def import_batch(self, rows):
+        """Вставляет пачку в одной транзакции: (вставлено, отброшено)."""
+        with transaction.atomic():
+            objects, skipped = self.build(rows)
+            kept = self.drop_existing(objects)
+            assign_ids(kept)
+            self.insert(kept)
+            if kept:
+                self.maintain(kept)
+        return len(kept), skipped + len(objects) - len(kept)
+
+    def insert(self, objects):
+        # auto_now_add в bulk_create ставит текущее время: даты из
+        # файла возвращаются вторым запросом. Сам флаг поля не трогаем:
+        # модель общая для всех потоков процесса.
+        dates = [getattr(obj, self.date_field) for obj in objects]
+        self.model.objects.bulk_create(objects)
+        for obj, date in zip(objects, dates):
+            setattr(obj, self.date_field, date)
+        self.model.objects.bulk_update(objects, [self.date_field])
+
+
+class PostImporter(Importer):
+    model = Post
+    date_field = 'pub_date'
+
+    def __init__(self, create_missing=False, keep_ids=True):
+        super().__init__(create_missing, keep_ids)
+        self.groups = Lookup(Group, 'slug', create_missing and (
+            lambda slug: Group(title=slug, slug=slug, description='')
+        ))
+
+    def build(self, rows):
+        authors = self.authors.resolve(row.get('author') for row in rows)
+        groups = self.groups.resolve(row.get('group') for row in rows)
+        objects, skipped = [], 0
+        for row in rows:
+            author_id = authors.get(row.get('author'))
+            if not author_id or not row.get('text'):
+                skipped += 1
+                continue
+            try:
+                post = Post(
+                    pk=_id(row, self.keep_ids), author_id=author_id,
+                    group_id=groups.get(row.get('group')),
+                    text=row['text'], pub_date=_date(row.get('pub_date')),
+                    image=row.get('image') or '',
+                )
+            except ValueError:
+                skipped += 1
+                continue
+            objects.append(post)
+        return objects, skipped
+
+    def maintain(self, posts):
+        # Строки UserStats, которых ещё нет, не заводим: UserStats.get_for
+        # посчитает их по таблицам, уже вместе с этими постами.
+        authors = Counter(post.author_id for post in posts)
+        counters.bump_many(
+            UserStats.objects, 'posts_count', authors, key='user_id'
+        )
+        groups = Counter(post.group_id for post in posts if post.group_id)
+        counters.bump_many(Group.objects, 'posts_count', groups)
+        timelines.fan_out_many((post.pk, post.author_id) for post in posts)
+        search.update([post.pk for post in posts])
+        _after_commit(
+            cache.index_key(),
+            *(cache.profile_key(author_id) for author_id in authors),
+            *(cache.group_key(group_id) for group_id in groups),
+        )
+
+
+class CommentImporter(Importer):
+    model = Comment
+    date_field = 'created'
+
+    def build(self, rows):
+        authors = self.authors.resolve(row.get('author') for row in rows)
+        post_ids = set()
+        for row in rows:
+            try:
+                post_ids.add(int(row.get('post')))
+            except (TypeError, ValueError):
+                pass
+        posts = set(Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', flat=True
+        ))
+        objects, skipped = [], 0
+        for row in rows:
+            author_id = authors.get(row.get('author'))
+            try:
+                comment = Comment(
+                    pk=_id(row, self.keep_ids), post_id=int(row['post']),
+                    author_id=author_id, text=row.get('text'),
+                    created=_date(row.get('created')),
+                )
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            if not author_id or comment.post_id not in posts or not (
+                comment.text
+            ):
+                skipped += 1
+                continue
+            objects.append(comment)
+        return objects, skipped
+
+    def maintain(self, comments):
+        per_post = Counter(comment.post_id for comment in comments)
+        counters.bump_many(Post.objects, 'comments_count', per_post)
+        # Только слова новых комментариев, без перечитывания старых.
+        search.change_comments(
+            (comment.post_id, comment.text) for comment in comments
+        )
+        _after_commit(*(cache.post_key(post_id) for post_id in per_post))
+
+
+IMPORTERS = {'posts': PostImporter, 'comments': CommentImporter}
@@ -0,0 +1,50 @@
+import random
+
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.management.base import BaseCommand
+
+from core.bench import format_summary, measure, summarize
+from posts import images, synthetic
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность приёма картинок: '
+        'проверку, разворот, ужатие и перекодирование пачки снимков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20)
+        parser.add_argument('--width', type=int, default=4032)
+        parser.add_argument('--height', type=int, default=3024)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        photos = [
+            synthetic.make_photo(
+                rng, options['width'], options['height'],
+                orientation=rng.choice((1, 3, 6, 8)),
+            )
+            for _ in range(options['count'])
+        ]
+        samples, size_in, size_out = [], 0, 0
+        for idx, photo in enumerate(photos):
+            upload = TemporaryUploadedFile(
+                f'photo{idx}.jpg', 'image/jpeg', len(photo), None
+            )
+            upload.write(photo)
+            with upload:
+                elapsed, stored = measure(images.ingest, upload)
+            samples.append(elapsed)
+            size_in += len(photo)
+            size_out += stored.size
+        total = sum(samples)
+        self.stdout.write(
+            f'картинок в секунду: {len(samples) / total:.1f}, '
+            f'на картинку: {format_summary(summarize(samples))}'
+        )
+        self.stdout.write(
+            f'объём: {size_in / 2 ** 20:.1f} МБ -> '
+            f'{size_out / 2 ** 20:.1f} МБ'
+        )
@@ -0,0 +1,81 @@
+import random
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from core.bench import format_summary, isolated_database, measure, summarize
+from posts import synthetic, timelines
+from posts.models import Post, TimelineEntry
+from posts.paginators import KeysetPaginator
+
+STRATEGIES = {
+    'read': lambda limit: 0,
+    'write': lambda limit: 10 ** 9,
+    'hybrid': lambda limit: limit,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ленты подписок: рассылку при публикации, '
+        'сборку при чтении и гибрид на синтетическом графе подписок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=30,
+                            help='подписок на пользователя')
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--reads', type=int, default=200)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='показатель распределения Ципфа')
+        parser.add_argument('--fanout-limit', type=int, default=100,
+                            help='порог подписчиков для гибрида')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            rng = random.Random(options['seed'])
+            user_ids = synthetic.create_users(options['users'])
+            weights = synthetic.create_follow_graph(
+                rng, user_ids, options['follows'], options['skew']
+            )
+            readers = rng.sample(
+                user_ids, min(options['reads'], len(user_ids))
+            )
+            for name, limit in STRATEGIES.items():
+                with override_settings(
+                    TIMELINE_FANOUT_LIMIT=limit(options['fanout_limit'])
+                ):
+                    self.run_strategy(
+                        name, random.Random(options['seed']),
+                        user_ids, weights, readers, options['posts'],
+                    )
+
+    def run_strategy(self, name, rng, user_ids, weights, readers, count):
+        Post.objects.all().delete()
+        timelines.assign_modes()
+        writes = []
+        for idx in range(count):
+            author_id = rng.choices(user_ids, cum_weights=weights)[0]
+            elapsed, _ = measure(
+                Post.objects.create, author_id=author_id, text=f'Пост {idx}'
+            )
+            writes.append(elapsed)
+        reads = []
+        for user_id in readers:
+            elapsed, _ = measure(self.read_first_page, user_id)
+            reads.append(elapsed)
+        self.stdout.write(
+            f'{name}: строк в лентах {TimelineEntry.objects.count()}\n'
+            f'  публикация: {format_summary(summarize(writes))}\n'
+            f'  чтение:     {format_summary(summarize(reads))}'
+        )
+
+    def read_first_page(self, user_id):
+        paginator = KeysetPaginator(
+            Post.objects.follow_feed(user_id),
+            settings.PAGINATOR_OBJECTS_PER_PAGE,
+        )
+        return list(paginator.get_page())
@@ -0,0 +1,270 @@
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.middleware.csrf import get_token
+from django.test import Client, RequestFactory
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from core.bench import (
+    WSGIDriver, compare, format_summary, isolated_database, measure,
+    summarize, zipf_weights,
+)
+from posts import synthetic
+from posts.models import Follow, Group, User
+
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment',
+)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон основных страниц на синтетических данных: '
+        'пропускная способность и p50/p99 через тестовый клиент и '
+        'WSGI-приложение, результат - JSON для сравнения между коммитами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--follows', type=int, default=30,
+                            help='подписок на пользователя')
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='показатель распределения Ципфа')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=10,
+                            help='запросов на сценарий до замеров')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='потоков WSGI-драйвера')
+        parser.add_argument('--cold', action='store_true',
+                            help='сбрасывать кэш перед каждым запросом')
+        parser.add_argument('--scenario', action='append',
+                            choices=SCENARIOS, dest='scenarios',
+                            help='только эти сценарии (можно повторять)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='куда записать JSON')
+        parser.add_argument('--compare', metavar='BASELINE',
+                            help='JSON прошлого прогона для сравнения')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='допустимое ухудшение p50/p99, доля')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as file:
+                baseline = json.load(file)
+        name = None
+        if options['concurrency'] > 1:
+            name = os.path.join(tempfile.gettempdir(), 'yatube_bench.sqlite3')
+        setup_test_environment()
+        try:
+            with isolated_database(name=name):
+                seeded, _ = measure(self.fill, options)
+                self.stdout.write(f'данные: {seeded:.1f} с')
+                results = self.run(options)
+        finally:
+            teardown_test_environment()
+        report = {'meta': self.meta(options), 'results': results}
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            self.check_regressions(baseline, report, options['tolerance'])
+
+    def meta(self, options):
+        return {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'options': {
+                key: options[key] for key in (
+                    'users', 'follows', 'groups', 'posts', 'comments',
+                    'skew', 'requests', 'warmup', 'concurrency', 'cold',
+                    'scenarios', 'seed',
+                )
+            },
+        }
+
+    def fill(self, options):
+        rng = random.Random(options['seed'])
+        self.user_ids = synthetic.create_users(options['users'])
+        self.weights = synthetic.create_follow_graph(
+            rng, self.user_ids, options['follows'], options['skew']
+        )
+        group_ids = synthetic.create_groups(options['groups'])
+        post_ids = synthetic.create_posts(
+            rng, self.user_ids, self.weights, options['posts'], group_ids
+        )
+        synthetic.create_comments(
+            rng, self.user_ids, post_ids, options['comments'],
+            options['skew'],
+        )
+        synthetic.rebuild_derived()
+        self.usernames = dict(User.objects.values_list('pk', 'username'))
+        self.group_slugs = list(
+            Group.objects.order_by('pk').values_list('slug', flat=True)
+        )
+        # Чем раньше пост, тем больше у него комментариев.
+        self.post_ids = post_ids
+        self.post_weights = zipf_weights(len(post_ids), options['skew'])
+        self.group_weights = zipf_weights(
+            len(self.group_slugs), options['skew']
+        )
+        self.reader = Follow.objects.order_by('user_id').first().user
+
+    def plan(self, rng, scenario, count):
+        """Запросы сценария: цели выбираются с перекосом по Ципфа."""
+        requests = []
+        for _ in range(count):
+            method, data = 'GET', None
+            if scenario == 'index':
+                path = reverse('posts:index')
+            elif scenario == 'group_posts':
+                path = reverse('posts:group_list', args=[
+                    rng.choices(self.group_slugs, self.group_weights)[0]
+                ])
+            elif scenario == 'profile':
+                path = reverse('posts:profile', args=[self.usernames[
+                    rng.choices(self.user_ids, cum_weights=self.weights)[0]
+                ]])
+            elif scenario == 'post_detail':
+                path = reverse('posts:post_detail', args=[
+                    rng.choices(self.post_ids, self.post_weights)[0]
+                ])
+            elif scenario == 'follow_index':
+                path = reverse('posts:follow_index')
+            elif scenario == 'post_create':
+                method = 'POST'
+                path = reverse('posts:create_post')
+                data = {'text': synthetic.make_text(rng)}
+            else:
+                method = 'POST'
+                path = reverse('posts:add_comment', args=[
+                    rng.choices(self.post_ids, self.post_weights)[0]
+                ])
+                data = {'text': synthetic.make_text(rng, 1, 10)}
+            requests.append({'method': method, 'path': path, 'data': data})
+        return requests
+
+    def run(self, options):
+        client = Client()
+        client.force_login(self.reader)
+        driver = WSGIDriver(self.wsgi_application(options['cold']))
+        # WSGI-запросы идут с настоящими cookie сессии и CSRF.
+        request = RequestFactory().get('/')
+        token = get_token(request)
+        auth = {
+            'cookies': {
+                settings.SESSION_COOKIE_NAME:
+                    client.cookies[settings.SESSION_COOKIE_NAME].value,
+                settings.CSRF_COOKIE_NAME: request.META['CSRF_COOKIE'],
+            },
+            'headers': {'HTTP_X_CSRFTOKEN': token},
+        }
+        results = {}
+        for scenario in options['scenarios'] or SCENARIOS:
+            rng = random.Random(f"{options['seed']}:{scenario}")
+            warmup = self.plan(rng, scenario, options['warmup'])
+            planned = self.plan(rng, scenario, options['requests'])
+            cache.clear()
+            self.run_client(client, warmup, options['cold'])
+            results[f'client:{scenario}'] = self.report(
+                scenario, 'client',
+                *self.run_client(client, planned, options['cold']),
+            )
+            cache.clear()
+            driver.run([{**kwargs, **auth} for kwargs in warmup])
+            results[f'wsgi:{scenario}'] = self.report(
+                scenario, 'wsgi',
+                *driver.run(
+                    [{**kwargs, **auth} for kwargs in planned],
+                    options['concurrency'],
+                ),
+            )
+        return results
+
+    def wsgi_application(self, cold):
+        application = get_wsgi_application()
+        if not cold:
+            return application
+
+        def cold_application(environ, start_response):
+            cache.clear()
+            return application(environ, start_response)
+
+        return cold_application
+
+    def run_client(self, client, requests, cold):
+        samples, errors = [], 0
+        start = time.perf_counter()
+        for kwargs in requests:
+            if cold:
+                cache.clear()
+            send = client.post if kwargs['method'] == 'POST' else client.get
+            elapsed, response = measure(send, kwargs['path'], kwargs['data'])
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                samples.append(elapsed)
+        return samples, errors, time.perf_counter() - start
+
+    def report(self, scenario, driver, samples, errors, wall):
+        summary = summarize(samples)
+        summary['errors'] = errors
+        summary['rps'] = round(len(samples) / wall, 1) if wall else None
+        self.stdout.write(
+            f'{driver:6} {scenario:13} {format_summary(summary)} '
+            f"rps={summary['rps']} ошибок={errors}"
+        )
+        return summary
+
+    def check_regressions(self, baseline, report, tolerance):
+        revision = baseline.get('meta', {}).get('revision')
+        if baseline.get('meta', {}).get('options') != report['meta'][
+            'options'
+        ]:
+            self.stdout.write(
+                f'внимание: параметры прогона {revision} другие, '
+                'сравнение может быть нечестным'
+            )
+        regressions = compare(
+            baseline['results'], report['results'], tolerance
+        )
+        if not regressions:
+            self.stdout.write(f'регрессий относительно {revision} нет')
+            return
+        for name, metric, old, new in regressions:
+            self.stdout.write(f'{name} {metric}: {old} -> {new} мс')
+        raise CommandError(
+            f'{len(regressions)} замеров хуже {revision} больше чем '
+            f'на {tolerance:.0%}'
+        )
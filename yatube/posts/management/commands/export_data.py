@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии и подписки в NDJSON '
+        'или CSV, по желанию со сжатием gzip; память не зависит от '
+        'размера таблиц'
+    )
+
+    def add_arguments(self, parser):
+        # Без choices: argparse сверял бы с ними и пустой список.
+        parser.add_argument('tables', nargs='*',
+                            help=f"{', '.join(export.TABLES)}; "
+                                 'по умолчанию - все')
+        parser.add_argument('--format', choices=list(export.FORMATS),
+                            default='ndjson')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output-dir', default='.',
+                            help='каталог для файлов; "-" - в stdout')
+        parser.add_argument('--chunk-size', type=int,
+                            help='строк из БД за раз')
+
+    def handle(self, *args, **options):
+        tables = options['tables'] or list(export.TABLES)
+        unknown = [table for table in tables if table not in export.TABLES]
+        if unknown:
+            raise CommandError(
+                f"Нет таблиц: {', '.join(unknown)}; "
+                f"есть {', '.join(export.TABLES)}"
+            )
+        for table in tables:
+            blocks = export.stream(
+                table, options['format'], options['gzip'],
+                chunk_size=options['chunk_size'],
+            )
+            if options['output_dir'] == '-':
+                for block in blocks:
+                    sys.stdout.buffer.write(block)
+                continue
+            path = os.path.join(options['output_dir'], export.filename(
+                table, options['format'], options['gzip']
+            ))
+            start = time.perf_counter()
+            with open(path, 'wb') as file:
+                for block in blocks:
+                    file.write(block)
+            self.stderr.write(
+                f'{path}: {os.path.getsize(path)} байт за '
+                f'{time.perf_counter() - start:.1f} с'
+            )
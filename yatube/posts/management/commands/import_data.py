@@ -0,0 +1,77 @@
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.bench import Progress
+from posts import importer
+from posts.models import Comment, ImportCheckpoint, Post
+from posts.synthetic import reset_sequences
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты или комментарии из NDJSON/CSV (можно .gz) '
+        'пачками bulk_create; после сбоя продолжает с контрольной точки'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--table', choices=list(importer.IMPORTERS),
+                            help='по умолчанию - по имени файла')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='строк в одной транзакции')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='заводить неизвестных авторов и группы')
+        parser.add_argument('--new-ids', action='store_true',
+                            help='не переносить id из файла')
+        parser.add_argument('--checkpoint',
+                            help='имя контрольной точки, по умолчанию '
+                                 'полный путь к файлу')
+        parser.add_argument('--resume', action='store_true',
+                            help='пропустить строки, уже импортированные '
+                                 'по контрольной точке')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        table = options['table'] or next((
+            name for name in importer.IMPORTERS
+            if os.path.basename(path).startswith(name)
+        ), None)
+        if table is None:
+            raise CommandError('Не понять, что в файле: задайте --table')
+        name = options['checkpoint'] or os.path.abspath(path)
+        if not options['resume']:
+            ImportCheckpoint.objects.filter(name=name).delete()
+        state, _ = ImportCheckpoint.objects.get_or_create(name=name)
+        if state.rows:
+            self.stdout.write(f'продолжаем со строки {state.rows}')
+        loader = importer.IMPORTERS[table](
+            create_missing=options['create_missing'],
+            keep_ids=not options['new_ids'],
+        )
+        rows = islice(importer.open_rows(path), state.rows, None)
+        progress = Progress(self.stdout.write, table)
+        done = 0
+        while True:
+            batch = list(islice(rows, options['batch_size']))
+            if not batch:
+                break
+            # Точка в той же транзакции, что и пачка: после сбоя
+            # пачка либо есть вместе с точкой, либо нет ни того, ни
+            # другого (и с --new-ids она не вставится второй раз).
+            with transaction.atomic():
+                inserted, skipped = loader.import_batch(batch)
+                state.rows += len(batch)
+                state.inserted += inserted
+                state.skipped += skipped
+                state.save()
+            done += len(batch)
+            progress(done)
+        progress.finish(done)
+        reset_sequences(Post, Comment)
+        state.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'вставлено {state.inserted}, отброшено {state.skipped}'
+        ))
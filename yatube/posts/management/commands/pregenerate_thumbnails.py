@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Строит миниатюры для картинок, загруженных до появления пула'
+
+    def handle(self, *args, **options):
+        # Уже построенные sorl миниатюры не пересоздаются: generate()
+        # только запишет их адреса в посты.
+        # Список целиком: generate() правит те же строки, по которым
+        # шёл бы курсор.
+        names = list(
+            Post.objects.exclude(image='')
+            .filter(thumbnails='')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        done = 0
+        for name in names:
+            thumbnails.generate(name)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f'Обработано картинок: {done}'))
@@ -0,0 +1,101 @@
+import random
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import (
+    setup_test_environment, teardown_test_environment,
+)
+from django.urls import reverse
+
+from core import profiling
+from core.bench import isolated_database
+from posts import synthetic
+from posts.models import Follow, Group, Post, User
+
+COLUMNS = (
+    ('view', 'URL', 28),
+    ('requests', 'n', 4),
+    ('mean_ms', 'ср., мс', 9),
+    ('p99_ms', 'p99, мс', 9),
+    ('mean_queries', 'SQL', 6),
+    ('max_queries', 'макс.', 6),
+    ('budget', 'бюджет', 7),
+    ('template_ms', 'шабл., мс', 10),
+    ('cache_hit_ratio', 'кэш', 6),
+    ('mean_size', 'байт', 8),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет основные страницы на синтетических данных и печатает '
+        'сводку ProfilingMiddleware: SQL, шаблоны, кэш, размер ответа'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='запросов к каждой странице')
+        parser.add_argument('--cold', action='store_true',
+                            help='сбрасывать кэш перед каждым запросом')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        try:
+            with isolated_database():
+                self.fill(options)
+                profiling.clear()
+                self.run(options)
+        finally:
+            teardown_test_environment()
+        self.print_summary(profiling.summary())
+
+    def fill(self, options):
+        rng = random.Random(options['seed'])
+        user_ids = synthetic.create_users(options['users'])
+        weights = synthetic.create_follow_graph(rng, user_ids, 20, 1.1)
+        group_ids = synthetic.create_groups(10)
+        post_ids = synthetic.create_posts(
+            rng, user_ids, weights, options['posts'], group_ids
+        )
+        synthetic.create_comments(
+            rng, user_ids, post_ids, options['comments']
+        )
+        synthetic.rebuild_derived()
+
+    def run(self, options):
+        author = User.objects.order_by('pk').first()
+        reader = Follow.objects.order_by('user_id').first().user
+        group = Group.objects.order_by('pk').first()
+        post = Post.objects.order_by('-comments_count').first()
+        client = Client()
+        client.force_login(reader)
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[group.slug]),
+            reverse('posts:profile', args=[author.username]),
+            reverse('posts:post_detail', args=[post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=кот',
+            reverse('posts:api_index'),
+        ]
+        cache.clear()
+        for _ in range(options['repeat']):
+            for url in urls:
+                if options['cold']:
+                    cache.clear()
+                client.get(url)
+
+    def print_summary(self, rows):
+        self.stdout.write(' '.join(
+            title.ljust(width) for _, title, width in COLUMNS
+        ))
+        for row in rows:
+            self.stdout.write(' '.join(
+                str('-' if row[key] is None else row[key]).ljust(width)
+                for key, _, width in COLUMNS
+            ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики постов, комментариев и подписок'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = counters.rebuild()
+        for table, rows in updated.items():
+            self.stdout.write(f'{table}: {rows}')
+        self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны'))
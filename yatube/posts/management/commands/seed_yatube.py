@@ -0,0 +1,128 @@
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.bench import Progress
+from posts import counters, search, synthetic, timelines
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, '
+        'постами, комментариями и подписками: bulk_create пачками '
+        'из генераторов, так что годится и для миллионов строк'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=300000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='среднее число подписок пользователя')
+        parser.add_argument('--follower-skew', type=float, default=1.1,
+                            help='показатель Ципфа для популярности '
+                                 'авторов (подписчики и посты)')
+        parser.add_argument('--comment-skew', type=float, default=1.1,
+                            help='показатель Ципфа для комментариев '
+                                 'по постам')
+        parser.add_argument('--images', type=int, default=0,
+                            help='сколько картинок-заглушек создать')
+        parser.add_argument('--image-share', type=float, default=0.3,
+                            help='доля постов с картинкой')
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='строк в одной транзакции')
+        parser.add_argument('--prefix', default='seed',
+                            help='префикс имён пользователей и slug групп')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='не пересчитывать счётчики, ленты '
+                                 'и индекс поиска')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {prefix!r} уже есть, '
+                'задайте другой --prefix'
+            )
+        self.options = options
+        user_ids = self.seed_users()
+        weights = synthetic.cumulative_zipf(
+            len(user_ids), options['follower_skew']
+        )
+        self.insert(
+            Follow, 'подписки', None,
+            synthetic.iter_follows(
+                self.rng('follows'), user_ids, weights, options['follows']
+            ),
+        )
+        group_ids = self.seed_groups()
+        post_ids = self.seed_posts(user_ids, weights, group_ids)
+        self.insert(
+            Comment, 'комментарии', options['comments'],
+            synthetic.iter_comments(
+                self.rng('comments'), synthetic.next_pk(Comment),
+                options['comments'], user_ids,
+                post_ids, synthetic.cumulative_zipf(
+                    len(post_ids), options['comment_skew']
+                ),
+            ),
+        )
+        synthetic.reset_sequences(User, Group, Post, Comment)
+        if not options['skip_derived']:
+            self.rebuild_derived()
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def rng(self, table):
+        # Свой генератор на таблицу: другое число строк в одной
+        # таблице не меняет содержимое остальных.
+        return random.Random(f"{self.options['seed']}:{table}")
+
+    def insert(self, model, label, total, objects):
+        progress = Progress(self.stdout.write, label, total)
+        inserted = synthetic.stream_insert(
+            model, objects, self.options['chunk_size'], progress
+        )
+        progress.finish(inserted)
+        return inserted
+
+    def seed_users(self):
+        count = self.options['users']
+        first = synthetic.next_pk(User)
+        self.insert(User, 'пользователи', count, synthetic.iter_users(
+            first, count, self.options['prefix']
+        ))
+        return range(first, first + count)
+
+    def seed_groups(self):
+        count = self.options['groups']
+        first = synthetic.next_pk(Group)
+        self.insert(Group, 'группы', count, synthetic.iter_groups(
+            first, count, self.options['prefix']
+        ))
+        return range(first, first + count)
+
+    def seed_posts(self, user_ids, weights, group_ids):
+        options = self.options
+        images = []
+        if options['images']:
+            images = synthetic.save_image_stubs(
+                self.rng('images'), options['images'], options['prefix']
+            )
+        first = synthetic.next_pk(Post)
+        self.insert(Post, 'посты', options['posts'], synthetic.iter_posts(
+            self.rng('posts'), first, options['posts'], user_ids, weights,
+            group_ids, images, options['image_share'],
+        ))
+        return range(first, first + options['posts'])
+
+    def rebuild_derived(self):
+        for label, rebuild in (
+            ('счётчики', counters.rebuild),
+            ('ленты подписок', timelines.rebuild),
+            ('индекс поиска', search.rebuild),
+        ):
+            self.stdout.write(f'{label}...')
+            rebuild()
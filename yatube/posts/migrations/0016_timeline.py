@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:08
+
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+BATCH_SIZE = 500
+
+
+def fill_timelines(apps, schema_editor):
+    """Ленты по всем подпискам, как posts.timelines.rebuild на момент
+    этой миграции: только модели из ``apps``."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    UserStats = apps.get_model('posts', 'UserStats')
+    pulled = set(UserStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('user_id', flat=True))
+    follows = Follow.objects.order_by('author_id').values_list(
+        'author_id', 'user_id'
+    )
+    entries = []
+    for author_id, rows in groupby(follows.iterator(), key=itemgetter(0)):
+        if author_id in pulled:
+            continue
+        recent = list(Post.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('pk', flat=True)[:settings.TIMELINE_BACKFILL])
+        entries += [
+            TimelineEntry(user_id=user_id, post_id=post_id)
+            for _, user_id in rows
+            for post_id in recent
+        ]
+        if len(entries) >= BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+            entries = []
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 18:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from posts import search
+
+
+def create_index(apps, schema_editor):
+    search.create_fts_table(schema_editor)
+    search.rebuild(apps)
+
+
+def drop_index(apps, schema_editor):
+    search.drop_fts_table(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_timeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='posts.Post')),
+                ('length', models.PositiveIntegerField(verbose_name='Число слов')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Основа слова')),
+                ('frequency', models.FloatField(verbose_name='Взвешенная частота')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='posts.SearchDocument')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchposting',
+            constraint=models.UniqueConstraint(fields=('term', 'document'), name='unique_search_posting'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
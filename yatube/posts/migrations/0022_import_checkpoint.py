@@ -0,0 +1,26 @@
+# Generated by Django 2.2.16 on 2026-10-18 20:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_thumbnails'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('rows', models.IntegerField(default=0, verbose_name='Прочитано строк')),
+                ('inserted', models.IntegerField(default=0, verbose_name='Вставлено')),
+                ('skipped', models.IntegerField(default=0, verbose_name='Отброшено')),
+            ],
+            options={
+                'verbose_name': 'Контрольная точка импорта',
+            },
+        ),
+    ]
@@ -1,19 +1,83 @@
+import json
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
 User = get_user_model()
 
 
+class CountedModel(models.Model):
+    """Запись вместе со счётчиками, которые правят сигналы post_save."""
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True, default='')
     description = models.TextField(default='', max_length=30)
+    posts_count = models.IntegerField('Число постов', default=0)
 
     def __str__(self):
         return self.title
 
 
-class Post(models.Model):
+class PostQuerySet(models.QuerySet):
+    FEED_FIELDS = (
+        'id', 'text', 'pub_date', 'image', 'thumbnails', 'author', 'group',
+        'comments_count',
+    )
+    AUTHOR_FIELDS = (
+        'author__username', 'author__first_name', 'author__last_name',
+    )
+    GROUP_FIELDS = ('group__title', 'group__slug')
+
+    def for_feed(self, author=True, group=True):
+        """Карточки ленты: нужные связи одним JOIN, лишние столбцы - мимо.
+
+        ``author``/``group`` отключают JOIN там, где лента и так
+        относится к одному автору или одной группе.
+        """
+        related, fields = [], list(self.FEED_FIELDS)
+        if author:
+            related.append('author')
+            fields.extend(self.AUTHOR_FIELDS)
+        if group:
+            related.append('group')
+            fields.extend(self.GROUP_FIELDS)
+        return self.select_related(*related).only(*fields)
+
+    def index_feed(self):
+        return self.for_feed()
+
+    def group_feed(self, group):
+        return self.filter(group=group).for_feed(group=False)
+
+    def author_feed(self, author):
+        return self.filter(author=author).for_feed(author=False)
+
+    def follow_feed(self, user):
+        """Лента подписок: разосланные посты плюс посты популярных авторов.
+
+        Посты популярных авторов (UserStats.timeline_pulled) не
+        рассылаются по лентам при публикации, а подбираются здесь, при
+        чтении.
+        """
+        pushed = TimelineEntry.objects.filter(user=user).values('post_id')
+        pulled = Follow.objects.filter(
+            user=user, author__stats__timeline_pulled=True,
+        ).values('author_id')
+        return self.filter(
+            models.Q(pk__in=pushed) | models.Q(author__in=pulled)
+        ).for_feed()
+
+
+class Post(CountedModel):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста',
@@ -44,17 +108,44 @@ class Post(models.Model):
         blank=True,
         help_text='можете загрузить картинку'
     )
+    comments_count = models.IntegerField('Число комментариев', default=0)
+    # Готовые миниатюры картинки (thumbnails.py): JSON
+    # {геометрия: [url, ширина, высота]}. Пусто - ещё не построены.
+    thumbnails = models.TextField(
+        'Миниатюры', blank=True, default='', editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return self.text[:15]
 
+    def thumbnail(self, geometry):
+        """(url, ширина, высота) готовой миниатюры или None."""
+        if not self.thumbnails:
+            return None
+        return json.loads(self.thumbnails).get(geometry)
+
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Под ленты группы и автора: фильтр плюс FEED_ORDERING целиком.
+        # Без -id SQLite досортировывает равные pub_date во временном
+        # B-дереве.
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date',
+            ),
+        ]
 
 
-class Comment(models.Model):
+class Comment(CountedModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -80,9 +171,13 @@ class Comment(models.Model):
 
     class Meta:
         verbose_name = 'Пост комментария'
+        indexes = [models.Index(
+            fields=['post', 'created'],
+            name='comment_post_created',
+        )]
 
 
-class Follow(models.Model):
+class Follow(CountedModel):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -100,3 +195,111 @@ class Follow(models.Model):
             fields=['author', 'user'],
             name='unique_follow'
         )]
+        # unique_follow начинается с автора, а лента подписок ищет
+        # по подписчику.
+        indexes = [models.Index(
+            fields=['user', 'author'],
+            name='follow_user_author',
+        )]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+    )
+    posts_count = models.IntegerField('Число постов', default=0)
+    followers_count = models.IntegerField('Число подписчиков', default=0)
+    following_count = models.IntegerField('Число подписок', default=0)
+    # Посты подбираются в ленты подписок при чтении (timelines): с
+    # TIMELINE_FANOUT_LIMIT подписчиков и до спада ниже
+    # TIMELINE_PUSH_LIMIT.
+    timeline_pulled = models.BooleanField(
+        'Посты подбираются при чтении', default=False
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+
+    @classmethod
+    def get_for(cls, user):
+        stats = cls.objects.filter(user_id=user.pk).first()
+        if stats is None:
+            # Счёт по таблицам - только для строки, которой ещё нет.
+            stats, _ = cls.objects.get_or_create(
+                user_id=user.pk, defaults=cls.actual_counts(user.pk)
+            )
+        return stats
+
+    @staticmethod
+    def actual_counts(user_id):
+        return {
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(user_id=user_id).count(),
+        }
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок пользователя, разосланный при публикации."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_timeline_entry'
+        )]
+
+
+class ImportCheckpoint(models.Model):
+    """Докуда дошёл import_data: пишется в транзакции каждой пачки."""
+
+    name = models.CharField('Файл', max_length=255, unique=True)
+    rows = models.IntegerField('Прочитано строк', default=0)
+    inserted = models.IntegerField('Вставлено', default=0)
+    skipped = models.IntegerField('Отброшено', default=0)
+
+    class Meta:
+        verbose_name = 'Контрольная точка импорта'
+
+
+class SearchDocument(models.Model):
+    """Пост в обратном индексе поиска (когда нет FTS5)."""
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document',
+    )
+    length = models.PositiveIntegerField('Число слов')
+
+
+class SearchPosting(models.Model):
+    document = models.ForeignKey(
+        SearchDocument,
+        on_delete=models.CASCADE,
+        related_name='postings',
+    )
+    term = models.CharField('Основа слова', max_length=100)
+    frequency = models.FloatField('Взвешенная частота')
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['term', 'document'],
+            name='unique_search_posting'
+        )]
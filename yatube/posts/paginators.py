@@ -0,0 +1,259 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+FEED_ORDERING = ('-pub_date', '-id')
+COMMENTS_ORDERING = ('created', 'id')
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+ELLIPSIS = '…'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def page_window(number, last, on_each_side=2, on_ends=1):
+    """Номера страниц вокруг текущей и по краям, пропуски - ELLIPSIS.
+
+    Сколько бы ни было страниц, ссылок не больше
+    ``2 * (on_each_side + on_ends) + 3``.
+    """
+    if last <= 2 * (on_each_side + on_ends) + 1:
+        return list(range(1, last + 1))
+    pages = []
+    # Многоточие заменяет хотя бы две страницы, иначе проще номер.
+    if number > on_each_side + on_ends + 2:
+        pages.extend(range(1, on_ends + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(number - on_each_side, number + 1))
+    else:
+        pages.extend(range(1, number + 1))
+    if number < last - on_each_side - on_ends - 1:
+        pages.extend(range(number + 1, number + on_each_side + 1))
+        pages.append(ELLIPSIS)
+        pages.extend(range(last - on_ends + 1, last + 1))
+    else:
+        pages.extend(range(number + 1, last + 1))
+    return pages
+
+
+def estimated_count(queryset):
+    """Число строк таблицы по статистике ANALYZE, если она есть.
+
+    Годится только для выборки без условий; None - оценки нет.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'sqlite' or queryset.query.where:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    return int(row[0].split()[0]) if row else None
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator без COUNT(*) на каждый запрос.
+
+    Число записей берётся из ``count`` - поддерживаемого счётчика
+    вроде Group.posts_count. Без него - из кэша по тексту запроса на
+    PAGINATOR_COUNT_CACHE_TIMEOUT секунд, а при промахе - из оценки
+    SQLite для таблицы целиком или настоящим COUNT(*).
+    """
+
+    ELLIPSIS = ELLIPSIS
+
+    def __init__(self, object_list, per_page, *args, count=None, **kwargs):
+        super().__init__(object_list, per_page, *args, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'count:' + hashlib.md5(
+            f'{self.object_list.db}:{sql}:{params}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = estimated_count(self.object_list)
+            if count is None:
+                count = self.object_list.count()
+            cache.set(key, count, settings.PAGINATOR_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        return page_window(
+            self.validate_number(number), self.num_pages,
+            on_each_side, on_ends,
+        )
+
+
+class KeysetPaginator(CachedCountPaginator):
+    """Постраничный вывод по ключу сортировки вместо OFFSET.
+
+    Первые ``offset_pages`` страниц по-прежнему открываются через
+    ``?page=``, дальше навигация идёт по непрозрачному ``?cursor=``,
+    в котором зашит ключ ``(pub_date, id)`` крайней записи страницы.
+    Число страниц считается приблизительно: COUNT ограничен
+    ``count_limit`` записями, а с ``count`` не считается вовсе.
+    """
+
+    def __init__(self, object_list, per_page, ordering=FEED_ORDERING,
+                 offset_pages=None, count_limit=None, **kwargs):
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.descending = ordering[0].startswith('-')
+        self.offset_pages = (
+            offset_pages or settings.PAGINATOR_OFFSET_PAGES
+        )
+        self.count_limit = count_limit or settings.PAGINATOR_COUNT_LIMIT
+
+    @cached_property
+    def bounded_count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return self.object_list[:self.count_limit + 1].count()
+
+    @property
+    def count_is_exact(self):
+        return self.bounded_count <= self.count_limit
+
+    @cached_property
+    def count(self):
+        return min(self.bounded_count, self.count_limit)
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            try:
+                return self._cursor_page(cursor)
+            except InvalidCursor:
+                pass
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            number = 1
+        return self._offset_page(min(max(number, 1), self.offset_pages))
+
+    def make_cursor(self, direction, number, obj):
+        values = [direction, number]
+        values += [str(getattr(obj, field)) for field in self.fields]
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def _page(self, rows, number, has_next):
+        # Шаблоны и тесты ждут обычный Page, а он сверяет номер с
+        # num_pages: подгоняем его под то, что известно о соседях.
+        if has_next:
+            self.num_pages = max(self.num_pages, number + 1)
+        else:
+            self.num_pages = number
+        page = self._get_page(rows, number, self)
+        page.is_offset = number <= self.offset_pages
+        last_offset = min(self.offset_pages, self.num_pages)
+        page.page_range = page_window(min(number, last_offset), last_offset)
+        page.last_page_number = None
+        if self.num_pages <= self.offset_pages and (
+            self.count_is_exact or not has_next
+        ):
+            page.last_page_number = self.num_pages
+        if has_next:
+            page.next_query = self._query(NEXT, number + 1, rows[-1])
+        if number > 1:
+            page.previous_query = self._query(PREVIOUS, number - 1, rows[0])
+        return page
+
+    def _query(self, direction, number, obj):
+        if number <= self.offset_pages:
+            return f'page={number}'
+        return f'cursor={self.make_cursor(direction, number, obj)}'
+
+    def _offset_page(self, number):
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            # Как и Paginator.get_page, за концом ленты отдаём последнюю.
+            return self._offset_page(min(self.num_pages, number - 1))
+        return self._page(
+            rows[:self.per_page], number, has_next=len(rows) > self.per_page
+        )
+
+    def _cursor_page(self, cursor):
+        direction, number, key = self._decode(cursor)
+        if direction == NEXT:
+            queryset = self.object_list.filter(self._beyond(key, forward=True))
+        else:
+            queryset = self.object_list.reverse().filter(
+                self._beyond(key, forward=False)
+            )
+        rows = list(queryset[:self.per_page + 1])
+        if not rows:
+            raise InvalidCursor(cursor)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            return self._page(rows, number, has_next=more)
+        return self._page(rows[::-1], number, has_next=True)
+
+    def _beyond(self, key, forward):
+        first, second = self.fields
+        lookup = 'lt' if self.descending == forward else 'gt'
+        return (
+            Q(**{f'{first}__{lookup}': key[0]})
+            | Q(**{first: key[0], f'{second}__{lookup}': key[1]})
+        )
+
+    def _decode(self, cursor):
+        padding = '=' * (-len(cursor) % 4)
+        try:
+            raw = base64.urlsafe_b64decode(cursor + padding)
+            direction, number, *values = json.loads(raw.decode())
+            number = int(number)
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS) or number < 1:
+            raise InvalidCursor(cursor)
+        if len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        model = self.object_list.model
+        try:
+            key = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, values)
+            ]
+        except ValidationError:
+            raise InvalidCursor(cursor)
+        if None in key:
+            raise InvalidCursor(cursor)
+        return direction, number, key
+
+
+def get_page_obj(request, queryset, **kwargs):
+    paginator = KeysetPaginator(
+        queryset, settings.PAGINATOR_OBJECTS_PER_PAGE, **kwargs
+    )
+    return paginator.get_page(
+        request.GET.get('page'), request.GET.get('cursor')
+    )
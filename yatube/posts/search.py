@@ -0,0 +1,423 @@
+"""Полнотекстовый поиск по постам.
+
+Документ поиска - пост: его текст, комментарии к нему и название
+группы, каждое поле со своим весом. В индекс попадают основы слов
+(stemmer), запрос приводится к основам так же, поэтому «котов»
+находит «кот». Индекс - таблица SQLite FTS5, а если её нет (другая
+СУБД или SQLite без FTS5) - собственный обратный индекс в таблицах
+SearchDocument и SearchPosting с ранжированием BM25 на Python.
+Индекс обновляется сигналами (signals.py): новый или удалённый
+комментарий правит только свои слова, без разбора всех комментариев
+поста. Целиком индекс перестраивается командой rebuild_search_index.
+"""
+import base64
+import binascii
+import json
+import math
+import re
+from collections import defaultdict
+from itertools import islice
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F
+
+from .stemmer import stem
+
+FTS_TABLE = 'posts_search'
+
+WEIGHTS = {'text': 1.0, 'comments': 0.5, 'group': 2.0}
+
+# Параметры BM25, как у bm25() в FTS5
+K1 = 1.2
+B = 0.75
+
+BATCH_SIZE = 500
+
+# Частота ниже этой - слово осталось только в ошибках округления.
+MIN_FREQUENCY = 1e-6
+
+# Длина SearchPosting.term
+MAX_TERM_LENGTH = 100
+
+WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return [
+        stem(word)[:MAX_TERM_LENGTH]
+        for word in WORD_RE.findall(text.lower())
+    ]
+
+
+_fts5 = None
+
+
+def fts5_available(db=connection):
+    # Опции сборки SQLite одни на весь процесс: спрашиваем один раз.
+    global _fts5
+    if db.vendor != 'sqlite':
+        return False
+    if _fts5 is None:
+        with db.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            _fts5 = 'ENABLE_FTS5' in {row[0] for row in cursor.fetchall()}
+    return _fts5
+
+
+def remove_run(words, terms):
+    """``words`` без первого вхождения подряд идущих ``terms``."""
+    size = len(terms)
+    for start in range(len(words) - size + 1):
+        if words[start:start + size] == terms:
+            return words[:start] + words[start + size:]
+    # Комментарий уже разошёлся с индексом: убираем слова по одному.
+    words = list(words)
+    for term in terms:
+        if term in words:
+            words.remove(term)
+    return words
+
+
+def create_fts_table(schema_editor):
+    if fts5_available(schema_editor.connection):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            'USING fts5(text, comments, grp)'
+        )
+
+
+def drop_fts_table(schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def documents(post_ids, apps=django_apps):
+    """Поля документов поиска: {post_id: {поле: [основы слов]}}."""
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    docs = {
+        pk: {
+            'text': tokenize(text),
+            'comments': [],
+            'group': tokenize(title or ''),
+        }
+        for pk, text, title in Post.objects.filter(
+            pk__in=post_ids
+        ).values_list('pk', 'text', 'group__title')
+    }
+    comments = Comment.objects.filter(post_id__in=list(docs)).order_by(
+        'pk'
+    ).values_list('post_id', 'text')
+    for post_id, text in comments.iterator():
+        docs[post_id]['comments'] += tokenize(text)
+    return docs
+
+
+class FTS5Index:
+    """Поиск в таблице FTS5: в колонках лежат основы через пробел."""
+
+    def __init__(self, apps=django_apps):
+        self.apps = apps
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                [(pk,) for pk in post_ids],
+            )
+
+    def update(self, post_ids):
+        self.remove(post_ids)
+        rows = [
+            (pk, ' '.join(doc['text']), ' '.join(doc['comments']),
+             ' '.join(doc['group']))
+            for pk, doc in documents(post_ids, self.apps).items()
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, comments, grp) '
+                'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+
+    def change_comments(self, post_id, terms, added):
+        """Дописывает или вырезает основы одного комментария.
+
+        False - документа поста ещё нет в индексе. Строку FTS5 всё равно
+        переиндексирует целиком, но в C и без чтения всех комментариев
+        из базы и их разбора.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT comments FROM {FTS_TABLE} WHERE rowid = %s',
+                [post_id],
+            )
+            row = cursor.fetchone()
+            if row is None:
+                return False
+            words = row[0].split()
+            if added:
+                words += terms
+            else:
+                words = remove_run(words, terms)
+            cursor.execute(
+                f'UPDATE {FTS_TABLE} SET comments = %s WHERE rowid = %s',
+                [' '.join(words), post_id],
+            )
+        return True
+
+    def search(self, terms, after=None, limit=None):
+        # bm25() отрицателен: чем меньше, тем выше документ.
+        query = ' '.join(f'"{term}"' for term in terms)
+        sql = (
+            f'SELECT score, rowid FROM ('
+            f'SELECT bm25({FTS_TABLE}, %s, %s, %s) AS score, rowid '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        )
+        params = [
+            WEIGHTS['text'], WEIGHTS['comments'], WEIGHTS['group'], query,
+        ]
+        if after:
+            sql += ' WHERE score > %s OR (score = %s AND rowid < %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, rowid DESC'
+        if limit:
+            sql += ' LIMIT %s'
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class InvertedIndex:
+    """Обратный индекс в обычных таблицах, для любой СУБД."""
+
+    def __init__(self, apps=django_apps):
+        self.Document = apps.get_model('posts', 'SearchDocument')
+        self.Posting = apps.get_model('posts', 'SearchPosting')
+        self.apps = apps
+
+    def remove(self, post_ids):
+        # Слова удаляются явно: при каскадном удалении поста сигнал
+        # комментария успевает пересоздать документ, и каскад уже
+        # собранных строк эти слова не покрывает.
+        self.Posting.objects.filter(document_id__in=post_ids).delete()
+        self.Document.objects.filter(post_id__in=post_ids).delete()
+
+    def update(self, post_ids):
+        self.remove(post_ids)
+        docs = documents(post_ids, self.apps)
+        postings = []
+        for pk, doc in docs.items():
+            frequencies = defaultdict(float)
+            for field, terms in doc.items():
+                for term in terms:
+                    frequencies[term] += WEIGHTS[field]
+            postings += [
+                self.Posting(document_id=pk, term=term, frequency=frequency)
+                for term, frequency in frequencies.items()
+            ]
+        self.Document.objects.bulk_create([
+            self.Document(
+                post_id=pk, length=sum(map(len, doc.values()))
+            )
+            for pk, doc in docs.items()
+        ])
+        self.Posting.objects.bulk_create(postings, batch_size=BATCH_SIZE)
+
+    def clear(self):
+        self.Document.objects.all().delete()
+
+    def change_comments(self, post_id, terms, added):
+        sign = 1 if added else -1
+        if not self.Document.objects.filter(post_id=post_id).update(
+            length=F('length') + sign * len(terms)
+        ):
+            return False
+        deltas = defaultdict(float)
+        for term in terms:
+            deltas[term] += sign * WEIGHTS['comments']
+        postings = self.Posting.objects.filter(document_id=post_id)
+        existing = set(postings.filter(term__in=list(deltas)).values_list(
+            'term', flat=True
+        ))
+        for term in existing:
+            postings.filter(term=term).update(
+                frequency=F('frequency') + deltas[term]
+            )
+        if added:
+            self.Posting.objects.bulk_create([
+                self.Posting(document_id=post_id, term=term, frequency=delta)
+                for term, delta in deltas.items() if term not in existing
+            ])
+        else:
+            # Слово было только в этом комментарии.
+            postings.filter(
+                term__in=list(deltas), frequency__lte=MIN_FREQUENCY
+            ).delete()
+        return True
+
+    def search(self, terms, after=None, limit=None):
+        terms = set(terms)
+        stats = self.Document.objects.aggregate(
+            total=Count('pk'), average=Avg('length')
+        )
+        total = stats['total']
+        if not terms or not total:
+            return []
+        matches = defaultdict(dict)
+        frequency = defaultdict(int)
+        for document_id, term, tf in self.Posting.objects.filter(
+            term__in=terms
+        ).values_list('document_id', 'term', 'frequency').iterator():
+            matches[document_id][term] = tf
+            frequency[term] += 1
+        # Как и FTS5, ищем документы со всеми словами запроса.
+        matches = {
+            pk: found for pk, found in matches.items()
+            if len(found) == len(terms)
+        }
+        if not matches:
+            return []
+        lengths = dict(self.Document.objects.filter(
+            post_id__in=list(matches)
+        ).values_list('post_id', 'length'))
+        average = stats['average'] or 1
+        # Документ могли удалить между запросами: его нет в lengths.
+        results = []
+        for pk, found in matches.items():
+            if pk not in lengths:
+                continue
+            score = 0.0
+            norm = K1 * (1 - B + B * lengths[pk] / average)
+            for term, tf in found.items():
+                idf = math.log(
+                    (total - frequency[term] + 0.5)
+                    / (frequency[term] + 0.5) + 1
+                )
+                score -= idf * tf * (K1 + 1) / (tf + norm)
+            results.append((score, pk))
+        results.sort(key=lambda row: (row[0], -row[1]))
+        if after:
+            results = [
+                (score, pk) for score, pk in results
+                if score > after[0] or (score == after[0] and pk < after[1])
+            ]
+        return results[:limit] if limit else results
+
+
+def get_index(apps=django_apps, db=connection):
+    backend = settings.SEARCH_BACKEND
+    if backend == 'auto':
+        backend = 'fts5' if fts5_available(db) else 'inverted'
+    return FTS5Index(apps) if backend == 'fts5' else InvertedIndex(apps)
+
+
+def search(query, after=None, limit=None):
+    """[(score, post_id)] по убыванию релевантности."""
+    terms = tokenize(query)
+    if not terms:
+        return []
+    return get_index().search(terms, after, limit)
+
+
+def _chunks(items):
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, BATCH_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def update(post_ids):
+    index = get_index()
+    with transaction.atomic():
+        for chunk in _chunks(post_ids):
+            index.update(chunk)
+
+
+def remove(post_ids):
+    if post_ids:
+        get_index().remove(list(post_ids))
+
+
+def change_comment(post_id, text, added=True):
+    """Добавляет в документ поста слова комментария или убирает их."""
+    change_comments([(post_id, text)], added)
+
+
+def change_comments(comments, added=True):
+    """То же для пар (post_id, текст): по одной правке на пост."""
+    terms = defaultdict(list)
+    for post_id, text in comments:
+        terms[post_id] += tokenize(text)
+    index = get_index()
+    with transaction.atomic():
+        missing = [
+            post_id for post_id, words in terms.items()
+            if words and not index.change_comments(post_id, words, added)
+        ]
+        if missing:
+            update(missing)
+
+
+def rebuild(apps=django_apps):
+    """Строит индекс заново, пачками по BATCH_SIZE постов.
+
+    Всё в одной транзакции: иначе каждая строка FTS5 коммитится
+    отдельно.
+    """
+    Post = apps.get_model('posts', 'Post')
+    index = get_index(apps)
+    post_ids = Post.objects.order_by('pk').values_list(
+        'pk', flat=True
+    ).iterator(chunk_size=BATCH_SIZE)
+    indexed = 0
+    with transaction.atomic():
+        index.clear()
+        for chunk in _chunks(post_ids):
+            index.update(chunk)
+            indexed += len(chunk)
+    return indexed
+
+
+def make_cursor(score, post_id):
+    raw = json.dumps([score, post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def parse_cursor(cursor):
+    """Ключ (score, post_id) из курсора или None, если он испорчен."""
+    if not cursor:
+        return None
+    padding = '=' * (-len(cursor) % 4)
+    try:
+        score, post_id = json.loads(
+            base64.urlsafe_b64decode(cursor + padding).decode()
+        )
+        return float(score), int(post_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+
+
+def get_page(query, cursor, per_page):
+    """Посты страницы поиска и курсор следующей (или None).
+
+    Как и в лентах, страницы идут по ключу (score, post_id) крайнего
+    результата, а не по OFFSET.
+    """
+    rows = search(query, parse_cursor(cursor), per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = make_cursor(*rows[-1])
+    Post = django_apps.get_model('posts', 'Post')
+    posts = Post.objects.for_feed().in_bulk([pk for _, pk in rows])
+    return [posts[pk] for _, pk in rows if pk in posts], next_cursor
@@ -0,0 +1,243 @@
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from . import cache, search, timelines
+from .counters import bump, bump_user
+from .models import Comment, Follow, Group, Post, User
+
+# Поля, которые видны на чужих страницах: карточках постов, лентах.
+USER_SHOWN_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_SHOWN_FIELDS = ('title', 'slug')
+
+
+@receiver(post_init, sender=Post)
+def remember_post_owners(sender, instance, **kwargs):
+    # __dict__, а не атрибут: у отложенных через only() полей нельзя
+    # вызывать лишний запрос ради каждой загруженной записи.
+    instance._loaded_author_id = instance.__dict__.get('author_id')
+    instance._loaded_group_id = instance.__dict__.get('group_id')
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        bump_user(instance.author_id, posts_count=1)
+        if instance.group_id:
+            bump(Group.objects.filter(pk=instance.group_id), posts_count=1)
+    else:
+        old_author_id = instance._loaded_author_id
+        if old_author_id and old_author_id != instance.author_id:
+            bump_user(old_author_id, posts_count=-1)
+            bump_user(instance.author_id, posts_count=1)
+        old_group_id = instance._loaded_group_id
+        if 'group_id' in instance.__dict__ and (
+            old_group_id != instance.group_id
+        ):
+            if old_group_id:
+                bump(Group.objects.filter(pk=old_group_id), posts_count=-1)
+            if instance.group_id:
+                bump(Group.objects.filter(pk=instance.group_id),
+                     posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    bump_user(instance.author_id, posts_count=-1)
+    if instance.group_id:
+        bump(Group.objects.filter(pk=instance.group_id), posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        bump(Post.objects.filter(pk=instance.post_id), comments_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), comments_count=-1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        bump_user(instance.author_id, followers_count=1)
+        bump_user(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    bump_user(instance.author_id, followers_count=-1)
+    bump_user(instance.user_id, following_count=-1)
+
+
+# Ленты подписок. Подключены после счётчиков: решение «рассылать или
+# подбирать при чтении» опирается на уже обновлённое число подписчиков.
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    if created:
+        timelines.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if not created:
+        return
+    timelines.switch_to_pull(instance.author_id)
+    if not timelines.is_pulled(instance.author_id):
+        timelines.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def forget_timeline(sender, instance, **kwargs):
+    timelines.forget(instance.user_id, instance.author_id)
+    timelines.switch_to_push(instance.author_id)
+
+
+# Версии кэша лент и карточек постов.
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post(sender, instance, **kwargs):
+    keys = {
+        cache.index_key(),
+        cache.post_key(instance.pk),
+        cache.profile_key(instance.author_id),
+        cache.profile_key(instance._loaded_author_id),
+    }
+    for group_id in (instance.__dict__.get('group_id'),
+                     instance._loaded_group_id):
+        if group_id:
+            keys.add(cache.group_key(group_id))
+    keys.discard(cache.profile_key(None))
+    cache.bump(*keys)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comments(sender, instance, **kwargs):
+    cache.bump(cache.post_key(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow(sender, instance, **kwargs):
+    cache.bump(
+        cache.profile_key(instance.author_id),
+        cache.profile_key(instance.user_id),
+    )
+
+
+def shown(instance, fields):
+    return tuple(instance.__dict__.get(field) for field in fields)
+
+
+@receiver(post_init, sender=User)
+def remember_user_names(sender, instance, **kwargs):
+    instance._loaded_shown = shown(instance, USER_SHOWN_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_user(sender, instance, created, **kwargs):
+    # Вход тоже сохраняет пользователя (last_login): версии меняет
+    # только смена имени.
+    names = shown(instance, USER_SHOWN_FIELDS)
+    if created or names == instance._loaded_shown:
+        return
+    instance._loaded_shown = names
+    keys = {cache.index_key(), cache.profile_key(instance.pk)}
+    for post_id, group_id in instance.posts.values_list('pk', 'group_id'):
+        keys.add(cache.post_key(post_id))
+        if group_id:
+            keys.add(cache.group_key(group_id))
+    # Имя подписано и под комментариями.
+    commented = instance.comments.values_list('post_id', flat=True)
+    keys.update(cache.post_key(post_id) for post_id in commented.distinct())
+    cache.bump(*keys)
+
+
+@receiver(post_init, sender=Group)
+def remember_group_names(sender, instance, **kwargs):
+    instance._loaded_shown = shown(instance, GROUP_SHOWN_FIELDS)
+
+
+def group_post_keys(post_ids_and_authors):
+    keys = set()
+    for post_id, author_id in post_ids_and_authors:
+        keys |= {cache.post_key(post_id), cache.profile_key(author_id)}
+    return keys
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group(sender, instance, created, **kwargs):
+    keys = {cache.group_key(instance.pk), cache.index_key()}
+    names = shown(instance, GROUP_SHOWN_FIELDS)
+    if not created and names != instance._loaded_shown:
+        # Название и ссылка на группу - в карточках её постов, в том
+        # числе в профилях авторов.
+        keys |= group_post_keys(
+            instance.posts.values_list('pk', 'author_id')
+        )
+    instance._loaded_shown = names
+    cache.bump(*keys)
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group(sender, instance, **kwargs):
+    # Посты уже без группы (SET_NULL), сигналов о них не было.
+    keys = group_post_keys(Post.objects.filter(
+        pk__in=instance._post_ids
+    ).values_list('pk', 'author_id'))
+    cache.bump(cache.group_key(instance.pk), cache.index_key(), *keys)
+
+
+# Индекс поиска: документ поста включает комментарии и группу.
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    search.update([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove([instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, created, **kwargs):
+    if created:
+        search.change_comment(instance.post_id, instance.text)
+    else:
+        # Прежний текст неизвестен: правки редки (только из админки).
+        search.update([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.change_comment(instance.post_id, instance.text, added=False)
+
+
+@receiver(post_save, sender=Group)
+def index_group_posts(sender, instance, created, **kwargs):
+    if not created:
+        search.update(list(instance.posts.values_list('pk', flat=True)))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # После удаления у постов уже group_id = NULL.
+    instance._post_ids = list(instance.posts.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def index_ungrouped_posts(sender, instance, **kwargs):
+    search.update(instance._post_ids)
+
+
+@receiver(post_save, sender=Post)
+def remember_saved_post_owners(sender, instance, **kwargs):
+    # Последним: обработчики выше сравнивают с прежними значениями.
+    remember_post_owners(sender, instance)
@@ -0,0 +1,119 @@
+"""Стеммер Snowball для русского языка.
+
+Перенос алгоритма
+https://snowballstem.org/algorithms/russian/stemmer.html
+без внешних зависимостей: поиску нужна только основа слова.
+"""
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = ((), (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+))
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует',
+        'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = ((), (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+DERIVATIONAL = ((), ('ост', 'ость'))
+
+
+def _after_vowel_pair(word, start):
+    """Начало области после первой пары «гласная, согласная»."""
+    for index in range(start + 1, len(word)):
+        if word[index - 1] in VOWELS and word[index] not in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip(word, limit, groups):
+    """Снимает самое длинное окончание из групп, если оно в области.
+
+    Окончания первой группы снимаются, только если перед ними «а»
+    или «я» (тоже внутри области); как и в Snowball, решает самое
+    длинное совпадение, а не первое подходящее.
+    """
+    conditional, plain = groups
+    found = max(
+        (
+            ending for ending in conditional + plain
+            if word.endswith(ending) and len(word) - len(ending) >= limit
+        ),
+        key=len,
+        default=None,
+    )
+    if found is None:
+        return None
+    stem = word[:-len(found)]
+    if found in plain:
+        return stem
+    if len(stem) > limit and stem[-1] in 'ая':
+        return stem
+    return None
+
+
+# Словарь живого текста невелик: основы частых слов считаются один раз.
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word),
+    )
+    r2 = _after_vowel_pair(word, _after_vowel_pair(word, 0))
+
+    # Шаг 1: деепричастие, иначе возвратность и одно из окончаний
+    # прилагательного, глагола или существительного.
+    stripped = _strip(word, rv, PERFECTIVE_GERUND)
+    if stripped is None:
+        word = _strip(word, rv, REFLEXIVE) or word
+        stripped = _strip(word, rv, ADJECTIVE)
+        if stripped is not None:
+            stripped = _strip(stripped, rv, PARTICIPLE) or stripped
+        else:
+            stripped = _strip(word, rv, VERB)
+            if stripped is None:
+                stripped = _strip(word, rv, NOUN)
+    word = stripped if stripped is not None else word
+
+    # Шаг 2.
+    if word.endswith('и') and len(word) > rv:
+        word = word[:-1]
+
+    # Шаг 3: словообразовательный суффикс в R2.
+    word = _strip(word, max(r2, rv), DERIVATIONAL) or word
+
+    # Шаг 4.
+    stripped = _strip(word, rv, SUPERLATIVE)
+    if stripped is not None:
+        word = stripped
+    if word.endswith('нн') and len(word) - 1 > rv:
+        word = word[:-1]
+    elif stripped is None and word.endswith('ь') and len(word) > rv:
+        word = word[:-1]
+    return word
@@ -0,0 +1,248 @@
+"""Синтетические данные для замеров: пользователи и граф подписок.
+
+Популярность авторов распределена по Ципфу: у первых пользователей
+подписчиков на порядки больше, чем у остальных, как в живой сети.
+Строки идут из генераторов iter_* пачками через stream_insert; посты
+разложены по последнему году, комментарии - между постом и сегодня.
+"""
+import io
+from datetime import timedelta
+from itertools import accumulate, islice
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from core.bench import zipf_weights
+
+from . import counters, search, timelines
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Строк в одной транзакции stream_insert у create_*. В bulk_create
+# размер пачки не передаём: сам Django режет её под лимиты SQLite.
+BATCH_SIZE = 1000
+
+HISTORY = timedelta(days=365)
+
+WORDS = (
+    'кот', 'собака', 'город', 'море', 'книга', 'музыка', 'утро', 'дорога',
+    'лес', 'друг', 'фото', 'погода', 'работа', 'кофе', 'вечер', 'поезд',
+)
+
+
+def age(idx, count, span=HISTORY):
+    """Возраст idx-й из ``count`` записей, разложенных по последним
+    ``span`` по возрастанию: даты без совпадений, как в живой ленте."""
+    return span / count * (count - idx)
+
+
+def make_text(rng, low=5, high=30):
+    return ' '.join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize()
+
+
+def create_users(count, prefix='user'):
+    first = next_pk(User)
+    stream_insert(User, iter_users(first, count, prefix), BATCH_SIZE)
+    return range(first, first + count)
+
+
+def create_follow_graph(rng, user_ids, mean_follows, skew):
+    """Подписки без сигналов, счётчики пересчитываются в конце.
+
+    Возвращает накопленные веса популярности авторов - для
+    rng.choices(cum_weights=...) и create_posts.
+    """
+    cum_weights = cumulative_zipf(len(user_ids), skew)
+    stream_insert(Follow, iter_follows(
+        rng, user_ids, cum_weights, mean_follows
+    ), BATCH_SIZE)
+    counters.rebuild()
+    return cum_weights
+
+
+def create_groups(count, prefix='group'):
+    first = next_pk(Group)
+    stream_insert(Group, iter_groups(first, count, prefix), BATCH_SIZE)
+    return range(first, first + count)
+
+
+def create_posts(rng, user_ids, cum_weights, count, group_ids=()):
+    """Посты без сигналов; пишут чаще те, у кого больше подписчиков."""
+    first = next_pk(Post)
+    stream_insert(Post, iter_posts(
+        rng, first, count, user_ids, cum_weights, group_ids
+    ), BATCH_SIZE)
+    return range(first, first + count)
+
+
+def create_comments(rng, user_ids, post_ids, count, skew=1.1):
+    """Комментарии без сигналов, больше всего - у первых постов."""
+    stream_insert(Comment, iter_comments(
+        rng, next_pk(Comment), count, user_ids, post_ids,
+        cumulative_zipf(len(post_ids), skew),
+    ), BATCH_SIZE)
+
+
+def rebuild_derived():
+    """Счётчики, ленты подписок и индекс поиска после bulk_create."""
+    counters.rebuild()
+    timelines.rebuild()
+    search.rebuild()
+
+
+def make_photo(rng, width, height, orientation=1):
+    """JPEG «с телефона»: цветные пятна и метка поворота в EXIF."""
+    image = Image.new('RGB', (width, height), tuple(
+        rng.randrange(256) for _ in range(3)
+    ))
+    draw = ImageDraw.Draw(image)
+    for _ in range(50):
+        x, y = rng.randrange(width), rng.randrange(height)
+        radius = rng.randrange(1, max(width, height) // 4)
+        draw.ellipse(
+            (x - radius, y - radius, x + radius, y + radius),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    content = io.BytesIO()
+    image.save(content, 'JPEG', quality=92, exif=exif.tobytes())
+    return content.getvalue()
+
+
+def next_pk(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True)
+    return (last.first() or 0) + 1
+
+
+def reset_sequences(*models):
+    """После вставки с явными pk (для PostgreSQL, как в loaddata)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def stream_insert(model, objects, chunk_size, progress=None):
+    """bulk_create из генератора пачками, каждая в своей транзакции.
+
+    В памяти одновременно только одна пачка; ``progress`` получает
+    число вставленных строк после каждой. Даты полей auto_now_add
+    bulk_create заменяет текущим временем: заданные генератором
+    возвращаются второй командой, bulk_update (для неё нужны pk).
+    """
+    auto_dates = [
+        field.attname for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    objects = iter(objects)
+    inserted = 0
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            return inserted
+        dated = [name for name in auto_dates if getattr(chunk[0], name)]
+        dates = [[getattr(obj, name) for name in dated] for obj in chunk]
+        with transaction.atomic():
+            model.objects.bulk_create(chunk)
+            if dated:
+                for obj, values in zip(chunk, dates):
+                    for name, value in zip(dated, values):
+                        setattr(obj, name, value)
+                model.objects.bulk_update(chunk, dated)
+        inserted += len(chunk)
+        if progress:
+            progress(inserted)
+
+
+def cumulative_zipf(count, skew):
+    """Накопленные веса Ципфа для rng.choices(cum_weights=...).
+
+    С готовыми накопленными весами выбор стоит O(log n), а не O(n),
+    как при передаче weights на каждый вызов.
+    """
+    return list(accumulate(zipf_weights(count, skew)))
+
+
+def iter_users(first_pk, count, prefix):
+    for idx in range(count):
+        yield User(
+            pk=first_pk + idx, username=f'{prefix}{idx}', password='!'
+        )
+
+
+def iter_groups(first_pk, count, prefix):
+    for idx in range(count):
+        yield Group(
+            pk=first_pk + idx, title=f'Группа {prefix}{idx}',
+            slug=f'{prefix}{idx}', description='',
+        )
+
+
+def iter_follows(rng, user_ids, cum_weights, mean_follows):
+    """Подписки: авторов выбирают по Ципфу, число подписок - от 0
+    до 2 * mean_follows у каждого."""
+    high = min(2 * mean_follows, len(user_ids) - 1)
+    for user_id in user_ids:
+        wanted = rng.randint(0, high)
+        authors = set()
+        for _ in range(10):
+            if len(authors) >= wanted:
+                break
+            authors.update(rng.choices(
+                user_ids, cum_weights=cum_weights, k=wanted - len(authors)
+            ))
+            authors.discard(user_id)
+        for author_id in sorted(authors)[:wanted]:
+            yield Follow(user_id=user_id, author_id=author_id)
+
+
+def iter_posts(rng, first_pk, count, user_ids, cum_weights, group_ids,
+               images=(), image_share=0):
+    choices = list(group_ids) + [None]
+    now = timezone.now()
+    for idx in range(count):
+        image = ''
+        if images and rng.random() < image_share:
+            image = rng.choice(images)
+        yield Post(
+            pk=first_pk + idx,
+            author_id=rng.choices(user_ids, cum_weights=cum_weights)[0],
+            group_id=rng.choice(choices),
+            text=make_text(rng),
+            image=image,
+            pub_date=now - age(idx, count),
+        )
+
+
+def iter_comments(rng, first_pk, count, user_ids, post_ids, cum_weights):
+    """Комментарии к постам iter_posts (``post_ids`` - их pk по
+    порядку): каждый позже своего поста."""
+    now = timezone.now()
+    indexes = range(len(post_ids))
+    for idx in range(count):
+        post_idx = rng.choices(indexes, cum_weights=cum_weights)[0]
+        yield Comment(
+            pk=first_pk + idx,
+            post_id=post_ids[post_idx],
+            author_id=rng.choice(user_ids),
+            text=make_text(rng, 1, 10),
+            created=now - age(post_idx, len(post_ids)) * rng.random(),
+        )
+
+
+def save_image_stubs(rng, count, prefix, size=(640, 480)):
+    """Несколько картинок на все посты: хранилище не раздувается."""
+    names = []
+    for idx in range(count):
+        content = ContentFile(make_photo(rng, *size))
+        names.append(default_storage.save(
+            f'posts/{prefix}{idx}.jpg', content
+        ))
+    return names
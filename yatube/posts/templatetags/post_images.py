@@ -0,0 +1,18 @@
+from collections import namedtuple
+
+from django import template
+
+register = template.Library()
+
+Thumbnail = namedtuple('Thumbnail', 'url width height')
+
+
+@register.simple_tag
+def post_thumbnail(post, geometry):
+    """Готовая миниатюра, а пока её нет - ссылка на оригинал."""
+    if not post.image:
+        return None
+    thumbnail = post.thumbnail(geometry)
+    if thumbnail is None:
+        return Thumbnail(post.image.url, None, None)
+    return Thumbnail(*thumbnail)
@@ -0,0 +1,124 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='Slug', description='Описание',
+        )
+        for idx in range(11):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {idx}',
+            )
+        cls.post = Post.objects.order_by('-pub_date', '-id').first()
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def get_json(self, url, client=None, **headers):
+        response = (client or self.client).get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, json.loads(response.content)
+
+    def test_feeds(self):
+        feeds = (
+            (reverse('posts:api_index'), self.client),
+            (reverse('posts:api_group_list', args=[self.group.slug]),
+             self.client),
+            (reverse('posts:api_profile', args=[self.author.username]),
+             self.client),
+            (reverse('posts:api_follow_index'), self.reader_client),
+        )
+        for url, client in feeds:
+            with self.subTest(url=url):
+                _, data = self.get_json(url, client)
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0], {
+                    'id': self.post.pk,
+                    'text': self.post.text,
+                    'pub_date': self.post.pub_date.isoformat(),
+                    'author': self.author.username,
+                    'group': self.group.slug,
+                    'image': None,
+                    'thumbnail': None,
+                    'comments_count': 0,
+                })
+                self.assertIsNone(data['previous'])
+                _, data = self.get_json(data['next'], client)
+                self.assertEqual(len(data['results']), 1)
+                self.assertIsNone(data['next'])
+
+    def test_follow_requires_login(self):
+        response = self.client.get(reverse('posts:api_follow_index'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_not_modified(self):
+        url = reverse('posts:api_index')
+        response, _ = self.get_json(url)
+        etag = response['ETag']
+        self.assertNotIn('Last-Modified', response)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Правка не меняет дату публикации: по одной дате клиент
+        # получил бы 304 на старый текст.
+        Post.objects.filter(pk=self.post.pk).first().save()
+        self.get_json(url, HTTP_IF_MODIFIED_SINCE=http_date())
+        response, _ = self.get_json(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail(self):
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        response, data = self.get_json(url)
+        self.assertEqual(data['comments'], [])
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий',
+        )
+        response, data = self.get_json(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(data['comments'], [{
+            'id': comment.pk,
+            'author': self.reader.username,
+            'text': comment.text,
+            'created': comment.created.isoformat(),
+        }])
+        self.assertIsNone(data['next'])
+        missing = reverse('posts:api_post_detail', args=[self.post.pk + 100])
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_post_detail_comments_are_paginated(self):
+        comments = [
+            Comment.objects.create(
+                post=self.post, author=self.reader, text=f'Комментарий {idx}',
+            )
+            for idx in range(5)
+        ]
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        ids, previous = [], None
+        while url:
+            _, data = self.get_json(url)
+            self.assertLessEqual(len(data['comments']), 2)
+            self.assertEqual(data['previous'] is None, previous is None)
+            ids += [comment['id'] for comment in data['comments']]
+            previous, url = url, data['next']
+        self.assertEqual(ids, [comment.pk for comment in comments])
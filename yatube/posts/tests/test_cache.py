@@ -0,0 +1,286 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import (
+    Client, RequestFactory, TestCase, override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import routing
+
+from .. import cache as feed_cache
+from .. import conditional
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class FeedCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Slug',
+            description='Тестовое описание',
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='OtherSlug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост',
+        )
+        cls.group_url = reverse('posts:group_list', kwargs={
+            'slug': cls.group.slug,
+        })
+        cls.profile_url = reverse('posts:profile', kwargs={
+            'username': cls.author.username,
+        })
+
+    def stale_edit(self):
+        """Правка в обход сигналов: видна только после сброса кэша."""
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+
+    def test_group_page_ignores_other_groups(self):
+        self.client.get(self.group_url)
+        self.stale_edit()
+        Post.objects.create(
+            author=self.author, group=self.other_group, text='Чужой пост'
+        )
+        self.assertNotContains(self.client.get(self.group_url), 'Тихая')
+
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свой пост'
+        )
+        self.assertContains(self.client.get(self.group_url), 'Свой пост')
+
+    def test_post_moved_between_groups(self):
+        self.client.get(self.group_url)
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = self.other_group
+        post.save()
+        self.assertNotContains(self.client.get(self.group_url), 'Первый')
+
+    def test_profile_invalidated_by_follow(self):
+        self.reader_client.get(self.profile_url)
+        Follow.objects.create(author=self.author, user=self.reader)
+        response = self.reader_client.get(self.profile_url)
+        self.assertContains(response, 'Отписаться')
+
+    def test_author_rename_invalidates_cards(self):
+        index = reverse('posts:index')
+        self.client.get(index)
+        post_version = feed_cache.get_versions(
+            [feed_cache.post_key(self.post.pk)]
+        )
+        # Вход сохраняет пользователя, но имени не меняет.
+        Client().force_login(self.author)
+        self.assertEqual(post_version, feed_cache.get_versions(
+            [feed_cache.post_key(self.post.pk)]
+        ))
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое'
+        author.last_name = 'Имя'
+        author.save()
+        self.assertContains(self.client.get(index), 'Новое Имя')
+        self.assertNotEqual(post_version, feed_cache.get_versions(
+            [feed_cache.post_key(self.post.pk)]
+        ))
+
+    def test_group_rename_invalidates_author_cards(self):
+        self.client.get(self.profile_url)
+        post_version = feed_cache.get_versions(
+            [feed_cache.post_key(self.post.pk)]
+        )
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertContains(self.client.get(self.profile_url), '/renamed/')
+        self.assertNotEqual(post_version, feed_cache.get_versions(
+            [feed_cache.post_key(self.post.pk)]
+        ))
+
+    def test_personal_parts_are_not_shared_between_users(self):
+        self.reader_client.get(self.profile_url)
+        response = self.client.get(self.profile_url)
+        self.assertNotContains(response, self.reader.username)
+
+    def test_page_is_shared_between_users(self):
+        """Одна копия страницы в кэше, шапка и кнопки - у каждого свои."""
+        author_client = Client()
+        author_client.force_login(self.author)
+        author_client.get(self.profile_url)
+        self.stale_edit()
+        pages = {
+            'author': author_client.get(self.profile_url),
+            'reader': self.reader_client.get(self.profile_url),
+            'anon': self.client.get(self.profile_url),
+        }
+        for name, response in pages.items():
+            with self.subTest(user=name):
+                self.assertContains(response, 'Первый пост')
+                self.assertNotContains(response, '<!--personal:')
+        self.assertContains(pages['author'], 'Пользователь: author')
+        self.assertContains(pages['author'], 'Скачать свои посты')
+        self.assertContains(pages['reader'], 'Пользователь: reader')
+        self.assertContains(pages['reader'], 'Подписаться')
+        self.assertNotContains(pages['reader'], 'Скачать свои посты')
+        self.assertContains(pages['anon'], 'Войти')
+
+    def test_page_with_csrf_token_is_not_cached(self):
+        view = feed_cache.cache_feed(lambda request: 'feed:test')(
+            lambda request: HttpResponse(get_token(request))
+        )
+        factory = RequestFactory()
+        self.assertNotEqual(
+            view(factory.get('/')).content, view(factory.get('/')).content
+        )
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_pinned_client_bypasses_page_cache(self):
+        rendered = []
+
+        def render(request):
+            rendered.append(routing.reads_from_replica())
+            return HttpResponse(str(len(rendered)))
+
+        view = routing.use_replica(
+            feed_cache.cache_feed(lambda request: 'feed:test')(render)
+        )
+        factory = RequestFactory()
+        with routing.request_scope(pinned=False):
+            self.assertEqual(view(factory.get('/')).content, b'1')
+        with routing.request_scope(pinned=True):
+            self.assertEqual(view(factory.get('/')).content, b'2')
+        # Страница клиента с привязкой нарисована из default и заменила
+        # собой страницу с реплики.
+        with routing.request_scope(pinned=False):
+            self.assertEqual(view(factory.get('/')).content, b'2')
+        self.assertEqual(rendered, [True, False])
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_no_etag_from_replica(self):
+        view = routing.use_replica(conditional.conditional(
+            lambda request: [feed_cache.index_key()]
+        )(lambda request: HttpResponse('Лента')))
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        with routing.request_scope(pinned=False):
+            self.assertFalse(view(request).has_header('ETag'))
+        with routing.request_scope(pinned=True):
+            self.assertTrue(view(request).has_header('ETag'))
+
+    def test_post_card_fragment(self):
+        self.client.get(reverse('posts:index'))
+        version = feed_cache.get_versions(
+            [feed_cache.post_key(self.post.pk)]
+        )
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assertNotEqual(
+            version,
+            feed_cache.get_versions([feed_cache.post_key(self.post.pk)]),
+        )
+
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Отредактированный'
+        )
+
+    def test_missing_version_is_not_reused(self):
+        first = feed_cache.get_versions(['feed:test'])
+        cache.delete(feed_cache.VERSION_PREFIX + 'feed:test')
+        self.assertGreater(feed_cache.get_versions(['feed:test']), first)
+
+
+class ConditionalPageTests(TestCase):
+    """Неизменившаяся страница отвечает 304 без ленты и шаблона."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост',
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', args=[cls.group.slug]),
+            'profile': reverse('posts:profile', args=['author']),
+            'post': reverse('posts:post_detail', args=[cls.post.pk]),
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def test_not_modified(self):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                post_selects = [
+                    query for query in queries
+                    if query['sql'].startswith('SELECT "posts_post"."id"')
+                ]
+                # Странице поста для ETag нужен сам пост, ленты не
+                # выбираются вовсе.
+                self.assertLessEqual(
+                    len(post_selects), 1 if name == 'post' else 0
+                )
+
+    def test_changes_invalidate_etag(self):
+        etags = {name: self.client.get(url)['ETag']
+                 for name, url in self.urls.items()}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Follow.objects.create(author=self.author, user=self.reader)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Ещё пост'
+        )
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[name]
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        url = self.urls['profile']
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_etag_depends_on_csrf_cookie(self):
+        # После нового входа кука CSRF другая: форма комментария со
+        # старым токеном не должна остаться в кэше браузера.
+        self.client.force_login(self.reader)
+        url = self.urls['post']
+        response = self.client.get(url)
+        self.assertIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        etag = response['ETag']
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 64
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
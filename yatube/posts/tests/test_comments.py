@@ -0,0 +1,69 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPagesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{idx}')
+            for idx in range(12)
+        ]
+        for idx, reader in enumerate(cls.readers):
+            Comment.objects.create(
+                post=cls.post, author=reader, text=f'Комментарий {idx}',
+            )
+        cls.url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def shown(self, content):
+        return re.findall(r'Комментарий \d+', content.decode())
+
+    def more_url(self, content):
+        found = re.search(r'class="comments-more[^"]*" href="([^"]+)"',
+                          content.decode())
+        return found and found.group(1).replace('&amp;', '&')
+
+    def test_lazy_pages(self):
+        response = self.client.get(self.url)
+        shown = self.shown(response.content)
+        url = self.more_url(response.content)
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            shown += self.shown(response.content)
+            url = self.more_url(response.content)
+        self.assertEqual(
+            shown, [f'Комментарий {idx}' for idx in range(12)]
+        )
+
+    def test_first_page_cached_until_new_comment(self):
+        self.client.get(self.url)
+        Comment.objects.filter(text='Комментарий 0').update(text='Тихо')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Комментарий 0')
+        Comment.objects.filter(text='Комментарий 1').delete()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'Комментарий 0')
+        self.assertContains(response, 'Тихо')
+        self.assertEqual(self.shown(response.content)[-1], 'Комментарий 5')
+
+    def test_unknown_post(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk + 1])
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Slug',
+            description='Тестовое описание',
+        )
+        self.other_group = Group.objects.create(
+            title='Другая группа',
+            slug='OtherSlug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, user, **expected):
+        stats = UserStats.objects.get(user=user)
+        for field, value in expected.items():
+            with self.subTest(user=user.username, field=field):
+                self.assertEqual(getattr(stats, field), value)
+
+    def test_posts_and_comments(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        Post.objects.create(author=self.author, text='Пост без группы')
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Comment.objects.create(post=post, author=self.author, text='Ок')
+
+        self.assertCounters(self.author, posts_count=2)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+        post.comments.first().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_group_change_and_delete(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.other_group
+        post.save()
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.other_group.posts_count, 1)
+
+        post.delete()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.other_group.posts_count, 0)
+        self.assertCounters(self.author, posts_count=0)
+
+    def test_follow(self):
+        follow = Follow.objects.create(author=self.author, user=self.reader)
+        self.assertCounters(self.author, followers_count=1, following_count=0)
+        self.assertCounters(self.reader, followers_count=0, following_count=1)
+        follow.delete()
+        self.assertCounters(self.author, followers_count=0)
+        self.assertCounters(self.reader, following_count=0)
+
+    def test_deleting_user_cascades(self):
+        post = Post.objects.create(author=self.reader, text='Пост')
+        Comment.objects.create(post=post, author=self.author, text='Ок')
+        Follow.objects.create(author=self.author, user=self.reader)
+        self.reader.delete()
+        self.assertFalse(UserStats.objects.filter(user_id=post.author_id))
+        self.assertCounters(self.author, followers_count=0)
+
+    def test_rebuild_command(self):
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(author=self.author, user=self.reader)
+        UserStats.objects.update(
+            posts_count=7, followers_count=7, following_count=7
+        )
+        UserStats.objects.filter(user=self.reader).delete()
+        Group.objects.update(posts_count=7)
+        Post.objects.update(comments_count=7)
+
+        call_command('rebuild_counters', stdout=StringIO())
+
+        self.assertCounters(
+            self.author, posts_count=1, followers_count=1, following_count=0
+        )
+        self.assertCounters(
+            self.reader, posts_count=0, followers_count=0, following_count=1
+        )
+        self.group.refresh_from_db()
+        self.other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.other_group.posts_count, 0)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
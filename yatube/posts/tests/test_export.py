@@ -0,0 +1,131 @@
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import export
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description=''
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост, "{idx}"'
+            )
+            for idx in range(5)
+        ]
+        cls.other = Post.objects.create(author=cls.reader, text='Чужой')
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def read(self, blocks, compress=False):
+        data = b''.join(blocks)
+        return (gzip.decompress(data) if compress else data).decode()
+
+    def test_ndjson(self):
+        rows = [
+            json.loads(line)
+            for line in self.read(export.stream('posts')).splitlines()
+        ]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['id'], self.posts[0].pk)
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['group'], 'group')
+        self.assertEqual(rows[0]['text'], 'Пост, "0"')
+        self.assertEqual(rows[0]['comments_count'], 1)
+        self.assertIsNone(rows[-1]['group'])
+
+    def test_csv_gzip_in_small_chunks(self):
+        text = self.read(
+            export.stream('posts', 'csv', True, chunk_size=2), True
+        )
+        header, *rows = csv.reader(io.StringIO(text))
+        self.assertEqual(header[:3], ['id', 'author', 'group'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][4], 'Пост, "1"')
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'export_data', 'comments', 'follows', output_dir=directory,
+                gzip=True, stderr=StringIO(),
+            )
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                ['comments.ndjson.gz', 'follows.ndjson.gz'],
+            )
+            path = os.path.join(directory, 'comments.ndjson.gz')
+            with gzip.open(path, 'rt') as file:
+                row, = map(json.loads, file)
+        self.assertEqual(row['post'], self.posts[0].pk)
+        self.assertEqual(row['author'], 'reader')
+
+    def test_command_exports_all_tables_by_default(self):
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                'export_data', output_dir=directory, stderr=StringIO(),
+            )
+            self.assertEqual(
+                sorted(os.listdir(directory)),
+                sorted(export.filename(table, 'ndjson', False)
+                       for table in export.TABLES),
+            )
+
+    def test_command_unknown_table(self):
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'users', output_dir='-')
+
+    def test_own_posts_download(self):
+        url = reverse('posts:post_export')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(self.author)
+        response = self.client.get(url, {'format': 'csv', 'gzip': ''})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('posts-author.csv.gz', response['Content-Disposition'])
+        header, *rows = csv.reader(io.StringIO(
+            self.read(response.streaming_content, True)
+        ))
+        self.assertEqual(
+            [int(row[0]) for row in rows],
+            [post.pk for post in self.posts],
+        )
+
+    def test_admin_action(self):
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        response = self.client.post(
+            reverse('admin:posts_follow_changelist'),
+            {
+                'action': 'export_ndjson',
+                '_selected_action': Follow.objects.values_list(
+                    'pk', flat=True
+                ),
+            },
+        )
+        row, = map(
+            json.loads, self.read(response.streaming_content).splitlines()
+        )
+        self.assertEqual(row['user'], 'reader')
+        self.assertEqual(row['author'], 'author')
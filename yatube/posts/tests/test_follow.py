@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Follow, Post
+from .. import timelines
+from ..models import Follow, Post, TimelineEntry
 
 User = get_user_model()
 
@@ -60,3 +61,98 @@ class FollowTests(TestCase):
         response = FollowTests.unsubscribed_user_client.get(url)
         posts = response.context['page_obj']
         self.assertNotIn(post, posts)
+
+
+class TimelineTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.other_reader = User.objects.create_user(username='other')
+
+    def feed(self, user):
+        return list(Post.objects.follow_feed(user))
+
+    def test_fan_out_on_write(self):
+        Follow.objects.create(author=self.author, user=self.reader)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post
+        ).exists())
+        self.assertEqual(self.feed(self.reader), [post])
+        self.assertEqual(self.feed(self.other_reader), [])
+
+    def test_backfill_on_follow_and_removal_on_unfollow(self):
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {idx}')
+            for idx in range(3)
+        ]
+        follow = Follow.objects.create(author=self.author, user=self.reader)
+        self.assertEqual(self.feed(self.reader), posts[::-1])
+        follow.delete()
+        self.assertEqual(self.feed(self.reader), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_popular_authors_are_read_on_read(self):
+        Follow.objects.create(author=self.author, user=self.reader)
+        Follow.objects.create(author=self.author, user=self.other_reader)
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertEqual(self.feed(self.reader), [post])
+        self.assertEqual(self.feed(self.other_reader), [post])
+
+        Follow.objects.get(user=self.other_reader).delete()
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post=post
+        ).exists())
+        self.assertEqual(self.feed(self.reader), [post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=3, TIMELINE_PUSH_LIMIT=2)
+    def test_push_resumes_only_below_lower_limit(self):
+        readers = [self.reader, self.other_reader] + [
+            User.objects.create_user(username=f'reader{idx}')
+            for idx in range(2)
+        ]
+        follows = [
+            Follow.objects.create(author=self.author, user=reader)
+            for reader in readers[:3]
+        ]
+        self.assertTrue(timelines.is_pulled(self.author.pk))
+        post = Post.objects.create(author=self.author, text='Пост')
+        # Отписка и подписка у границы ничего не переключают.
+        for _ in range(2):
+            follows[2].delete()
+            self.assertTrue(timelines.is_pulled(self.author.pk))
+            follows[2] = Follow.objects.create(
+                author=self.author, user=readers[2]
+            )
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+        follows[2].delete()
+        follows[1].delete()
+        self.assertFalse(timelines.is_pulled(self.author.pk))
+        self.assertEqual(
+            list(TimelineEntry.objects.filter(post=post).values_list(
+                'user_id', flat=True
+            )),
+            [self.reader.pk],
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_rebuild(self):
+        popular = User.objects.create_user(username='popular')
+        Follow.objects.create(author=self.author, user=self.reader)
+        Follow.objects.create(author=popular, user=self.reader)
+        Follow.objects.create(author=popular, user=self.other_reader)
+        posts = [
+            Post.objects.create(author=author, text='Пост')
+            for author in (self.author, popular, self.author)
+        ]
+        TimelineEntry.objects.all().delete()
+        timelines.rebuild()
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user_id', 'post_id')),
+            {(self.reader.pk, posts[0].pk), (self.reader.pk, posts[2].pk)},
+        )
+        self.assertEqual(self.feed(self.reader), posts[::-1])
+        self.assertEqual(self.feed(self.other_reader), [posts[1]])
@@ -0,0 +1,96 @@
+import io
+import random
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from .. import synthetic
+from ..forms import PostForm
+
+
+def upload(content, name):
+    return SimpleUploadedFile(name, content, content_type='image/*')
+
+
+def make_png(size):
+    content = io.BytesIO()
+    Image.new('RGBA', size, (255, 0, 0, 128)).save(content, 'PNG')
+    return content.getvalue()
+
+
+def make_gif(size, colors, **options):
+    frames = [Image.new('RGBA', size, color) for color in colors]
+    content = io.BytesIO()
+    frames[0].save(
+        content, 'GIF', save_all=True, append_images=frames[1:],
+        **options,
+    )
+    return content.getvalue()
+
+
+def clean_image(content, name):
+    form = PostForm(
+        data={'text': 'Пост'}, files={'image': upload(content, name)}
+    )
+    form.is_valid()
+    return form
+
+
+@override_settings(IMAGE_MAX_SIDE=200, IMAGE_FORMAT='WEBP')
+class IngestTests(TestCase):
+    def open_stored(self, form):
+        image = form.cleaned_data['image']
+        image.seek(0)
+        return Image.open(image)
+
+    def test_downscaled_and_converted(self):
+        form = clean_image(make_png((600, 300)), 'big.png')
+        self.assertTrue(form.cleaned_data['image'].name.endswith('big.webp'))
+        image = self.open_stored(form)
+        self.assertEqual(image.format, 'WEBP')
+        self.assertEqual(image.size, (200, 100))
+        self.assertEqual(image.mode, 'RGBA')
+
+    @override_settings(IMAGE_FORMAT='JPEG')
+    def test_oriented_and_stripped(self):
+        photo = synthetic.make_photo(random.Random(1), 120, 60, orientation=6)
+        form = clean_image(photo, 'photo.jpg')
+        image = self.open_stored(form)
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (60, 120))
+        self.assertNotIn('exif', image.info)
+
+    def test_limits(self):
+        content = make_png((100, 100))
+        for limits, code in (
+            ({'IMAGE_MAX_BYTES': len(content) - 1}, 'file_too_large'),
+            ({'IMAGE_MAX_PIXELS': 100 * 100 - 1}, 'too_many_pixels'),
+        ):
+            with self.subTest(code=code), override_settings(**limits):
+                form = clean_image(content, 'image.png')
+                self.assertEqual(
+                    form.errors.as_data()['image'][0].code, code
+                )
+
+    def test_gif_keeps_frames_without_metadata(self):
+        content = make_gif(
+            (400, 100), ['red', 'blue', 'green'], duration=[100, 200, 300],
+            loop=0, comment=b'GPS 55.75 37.61',
+        )
+        form = clean_image(content, 'anim.gif')
+        stored = form.cleaned_data['image']
+        self.assertTrue(stored.name.endswith('anim.gif'))
+        stored.seek(0)
+        self.assertNotIn(b'GPS', stored.read())
+        image = self.open_stored(form)
+        self.assertEqual(image.format, 'GIF')
+        self.assertEqual(image.size, (200, 50))
+        self.assertEqual(image.n_frames, 3)
+        self.assertEqual(image.info['loop'], 0)
+        self.assertNotIn('comment', image.info)
+        durations = []
+        for index in range(image.n_frames):
+            image.seek(index)
+            durations.append(image.info['duration'])
+        self.assertEqual(durations, [100, 200, 300])
@@ -0,0 +1,165 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.test import TestCase
+
+from .. import importer, search
+from ..models import (
+    Comment, Follow, Group, ImportCheckpoint, Post, TimelineEntry, UserStats,
+)
+
+User = get_user_model()
+
+
+class ImportTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.group = Group.objects.create(
+            title='Группа', slug='cats', description=''
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_ndjson(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with gzip.open(path, 'wt') as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def run_import(self, path, **options):
+        stdout = StringIO()
+        call_command('import_data', path, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_posts(self):
+        path = self.write_ndjson('posts.ndjson.gz', [
+            {'id': 100 + idx, 'author': 'author', 'group': 'cats',
+             'pub_date': f'2020-01-0{idx + 1}T10:00:00', 'text': 'Про котов'}
+            for idx in range(3)
+        ] + [
+            {'id': 200, 'author': 'ghost', 'text': 'Неизвестный автор'},
+            {'id': 201, 'author': 'author', 'text': ''},
+        ])
+        output = self.run_import(path, batch_size=2)
+        self.assertIn('вставлено 3, отброшено 2', output)
+        self.assertIn('строк/с', output)
+        post = Post.objects.get(pk=100)
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(
+            post.pub_date.isoformat(), '2020-01-01T10:00:00+00:00'
+        )
+        # То, что делают сигналы, сделано после пачек.
+        self.assertEqual(UserStats.get_for(self.author).posts_count, 3)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(len(search.search('кот')), 3)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+        # Повторный запуск не дублирует посты и счётчики.
+        self.run_import(path)
+        self.assertEqual(Post.objects.count(), 3)
+        self.assertEqual(UserStats.get_for(self.author).posts_count, 3)
+        # Новый пост получает id после импортированных.
+        new = Post.objects.create(author=self.author, text='Новый')
+        self.assertGreater(new.pk, 100)
+
+    def test_comments_csv_and_create_missing(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        path = os.path.join(self.directory, 'comments.csv')
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['id', 'post', 'author', 'created', 'text'])
+            writer.writerow(['', post.pk, 'newbie', '', 'Привет'])
+            writer.writerow(['', 999, 'author', '', 'К чужому посту'])
+        self.run_import(path, create_missing=True)
+        comment = Comment.objects.get()
+        self.assertEqual(comment.author.username, 'newbie')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            [pk for _, pk in search.search('привет')], [post.pk]
+        )
+
+    def test_resume_from_checkpoint(self):
+        path = self.write_ndjson('posts.ndjson.gz', [
+            {'author': 'author', 'text': f'Пост {idx}'} for idx in range(5)
+        ])
+        ImportCheckpoint.objects.create(
+            name=os.path.abspath(path), rows=3, inserted=3,
+        )
+        output = self.run_import(path, resume=True, new_ids=True)
+        self.assertIn('продолжаем со строки 3', output)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('text', flat=True)),
+            ['Пост 3', 'Пост 4'],
+        )
+
+    def test_failed_batch_keeps_checkpoint_consistent(self):
+        path = self.write_ndjson('posts.ndjson.gz', [
+            {'author': 'author', 'text': f'Пост {idx}'} for idx in range(4)
+        ])
+        save = ImportCheckpoint.save
+
+        def failing_save(checkpoint, *args, **kwargs):
+            if checkpoint.rows == 4:
+                raise RuntimeError('сбой')
+            save(checkpoint, *args, **kwargs)
+
+        with mock.patch.object(ImportCheckpoint, 'save', failing_save):
+            with self.assertRaises(RuntimeError):
+                self.run_import(path, batch_size=2, new_ids=True)
+        # Вторая пачка откатилась вместе со своей точкой.
+        self.assertEqual(Post.objects.count(), 2)
+        self.run_import(path, batch_size=2, new_ids=True, resume=True)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            [f'Пост {idx}' for idx in range(4)],
+        )
+
+    def test_comment_dates_with_new_ids(self):
+        post = Post.objects.create(author=self.author, text='Пост')
+        path = self.write_ndjson('comments.ndjson.gz', [
+            {'id': 5, 'post': post.pk, 'author': 'reader', 'text': 'Старый',
+             'created': '2019-05-01T12:00:00'},
+        ])
+        self.run_import(path, new_ids=True)
+        comment = Comment.objects.get()
+        self.assertEqual(
+            comment.created.isoformat(), '2019-05-01T12:00:00+00:00'
+        )
+        self.assertTrue(
+            Comment._meta.get_field('created').auto_now_add
+        )
+        self.assertEqual([pk for _, pk in search.search('старый')],
+                         [post.pk])
+
+    def test_new_ids_are_reserved(self):
+        Post.objects.create(author=self.author, text='Был')
+        posts = [Post(author=self.author, text='Из файла') for _ in range(3)]
+        with transaction.atomic():
+            importer.assign_ids(posts)
+            live = Post.objects.create(author=self.author, text='С сайта')
+            Post.objects.bulk_create(posts)
+        self.assertEqual(Post.objects.count(), 5)
+        self.assertGreater(live.pk, max(post.pk for post in posts))
+
+    def test_unknown_table(self):
+        path = self.write_ndjson('dump.ndjson.gz', [])
+        with self.assertRaises(CommandError):
+            self.run_import(path)
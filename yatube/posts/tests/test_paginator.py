@@ -0,0 +1,139 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..paginators import ELLIPSIS, CachedCountPaginator, page_window
+
+User = get_user_model()
+
+
+@override_settings(PAGINATOR_OFFSET_PAGES=2, PAGINATOR_COUNT_LIMIT=25)
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for idx in range(35):
+            Post.objects.create(author=cls.author, text=f'Пост {idx}')
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+        cls.url = reverse('posts:profile', kwargs={
+            'username': cls.author.username,
+        })
+
+    def get_page(self, query=''):
+        cache.clear()
+        response = self.client.get(f'{self.url}?{query}')
+        return response.context['page_obj']
+
+    def test_walk_forward_and_back(self):
+        """По ссылкам «Следующая»/«Предыдущая» лента проходится целиком."""
+        page = self.get_page()
+        pages = [list(page)]
+        queries = ['']
+        while page.has_next():
+            queries.append(page.next_query)
+            page = self.get_page(page.next_query)
+            pages.append(list(page))
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual(page.number, 4)
+        self.assertTrue(queries[-1].startswith('cursor='))
+
+        while page.has_previous():
+            number = page.number
+            page = self.get_page(page.previous_query)
+            self.assertEqual(page.number, number - 1)
+            self.assertEqual(list(page), pages[page.number - 1])
+
+    def test_offset_pages(self):
+        self.assertEqual(list(self.get_page('page=2')), self.expected[10:20])
+        self.assertEqual(list(self.get_page('page=100')),
+                         self.expected[10:20])
+
+    def test_bad_cursor_falls_back_to_first_page(self):
+        for cursor in ('garbage', 'W10', 'WyJuIiwzLCJ4IiwiMSJd'):
+            with self.subTest(cursor=cursor):
+                page = self.get_page(f'cursor={cursor}')
+                self.assertEqual(page.number, 1)
+                self.assertEqual(list(page), self.expected[:10])
+
+    def test_approximate_count(self):
+        paginator = self.get_page().paginator
+        self.assertFalse(paginator.count_is_exact)
+        self.assertEqual(paginator.count, 25)
+        self.assertEqual(paginator.num_pages, 3)
+
+
+class PageWindowTests(TestCase):
+    def test_short_range_is_complete(self):
+        self.assertEqual(page_window(3, 7), [1, 2, 3, 4, 5, 6, 7])
+
+    def test_long_range_is_elided(self):
+        cases = {
+            1: [1, 2, 3, ELLIPSIS, 1000],
+            5: [1, 2, 3, 4, 5, 6, 7, ELLIPSIS, 1000],
+            500: [1, ELLIPSIS, 498, 499, 500, 501, 502, ELLIPSIS, 1000],
+            1000: [1, ELLIPSIS, 998, 999, 1000],
+        }
+        for number, expected in cases.items():
+            with self.subTest(number=number):
+                self.assertEqual(page_window(number, 1000), expected)
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        for idx in range(15):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {idx}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_known_count(self):
+        paginator = CachedCountPaginator(Post.objects.all(), 10, count=42)
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, 5)
+
+    def test_count_is_cached(self):
+        queryset = Post.objects.filter(author=self.author)
+        self.assertEqual(CachedCountPaginator(queryset, 10).count, 15)
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCountPaginator(queryset, 10).count, 15)
+
+    def test_estimate_from_sqlite_stats(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with CaptureQueriesContext(connection) as queries:
+            count = CachedCountPaginator(Post.objects.all(), 10).count
+        self.assertEqual(count, 15)
+        self.assertNotIn('COUNT', queries[0]['sql'])
+
+    def test_feed_pages_use_maintained_counters(self):
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 15)
+        self.assertFalse(
+            [query for query in queries if 'COUNT' in query['sql']]
+        )
+
+    def test_admin_changelist(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(
+            response.context['cl'].paginator, CachedCountPaginator
+        )
@@ -0,0 +1,196 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import thumbnails
+from ..models import Comment, Follow, Group, Post
+from ..paginators import COMMENTS_ORDERING, FEED_ORDERING
+from .test_thumbnails import make_png
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+def create_posts(count, **fields):
+    """Посты с картинками: у половины миниатюры уже построены."""
+    posts = []
+    for idx in range(count):
+        post = Post.objects.create(
+            text=f'Пост про кота {idx}', image=make_png(), **fields
+        )
+        if idx % 2:
+            thumbnails.generate(post.image.name)
+        posts.append(post)
+    return posts
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class FeedQueryBudgetTests(TestCase):
+    """Число запросов ленты не зависит от числа постов на странице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Имя', last_name='Фамилия',
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='Slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(author=cls.author, user=cls.reader)
+        cls.feeds = {
+            'index': (None, reverse('posts:index')),
+            'group': (None, reverse('posts:group_list', kwargs={
+                'slug': cls.group.slug,
+            })),
+            'profile': (None, reverse('posts:profile', kwargs={
+                'username': cls.author.username,
+            })),
+            'follow': (cls.reader_client, reverse('posts:follow_index')),
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def add_posts(self, count):
+        create_posts(count, author=self.author, group=self.group)
+
+    def count_queries(self, client, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.add_posts(1)
+        small = {
+            name: self.count_queries(client, url)
+            for name, (client, url) in self.feeds.items()
+        }
+        self.add_posts(9)
+        for name, (client, url) in self.feeds.items():
+            with self.subTest(feed=name):
+                self.assertEqual(self.count_queries(client, url), small[name])
+
+    def test_feed_queries_have_no_per_row_lookups(self):
+        self.add_posts(10)
+        for name, (client, url) in self.feeds.items():
+            with self.subTest(feed=name):
+                cache.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    (client or self.client).get(url)
+                post_selects = [
+                    query['sql'] for query in queries
+                    if 'FROM "posts_post"' in query['sql']
+                    and 'COUNT' not in query['sql']
+                    and 'MAX' not in query['sql']
+                ]
+                self.assertEqual(len(post_selects), 1, post_selects)
+                self.assertNotIn('"auth_user"."password"', post_selects[0])
+
+
+class FeedQueryPlanTests(TestCase):
+    """Ленты идут по индексу в нужном порядке, без сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+
+    def plan(self, queryset):
+        return queryset[:11].explain()
+
+    def assertSortedByIndex(self, queryset, index):
+        plan = self.plan(queryset)
+        self.assertIn(f'USING INDEX {index}', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds(self):
+        feeds = {
+            'posts_post_pub_date': Post.objects.index_feed(),
+            'post_group_pub_date': Post.objects.group_feed(self.group),
+            'post_author_pub_date': Post.objects.author_feed(self.author),
+        }
+        for index, queryset in feeds.items():
+            with self.subTest(index=index):
+                self.assertSortedByIndex(
+                    queryset.order_by(*FEED_ORDERING), index
+                )
+
+    def test_comments(self):
+        self.assertSortedByIndex(
+            Comment.objects.filter(post_id=1).order_by(*COMMENTS_ORDERING),
+            'comment_post_created',
+        )
+
+    def test_follow_feed(self):
+        # Объединение ленты и постов популярных авторов сортируется,
+        # но отбирается целиком по индексам.
+        plan = self.plan(
+            Post.objects.follow_feed(self.author).order_by(*FEED_ORDERING)
+        )
+        self.assertIn('INDEX follow_user_author (user_id=?)', plan)
+        self.assertIn('INDEX post_author_pub_date (author_id=?)', plan)
+        self.assertNotIn('SCAN', plan)
+
+
+@override_settings(QUERY_BUDGET_ERRORS=True, MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ViewQueryBudgetTests(TestCase):
+    """Страницы укладываются в QUERY_BUDGETS даже с пустым кэшем."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='Slug', description='Описание',
+        )
+        Follow.objects.create(author=cls.author, user=cls.reader)
+        for post in create_posts(15, author=cls.author, group=cls.group):
+            Comment.objects.create(
+                post=post, author=cls.reader, text='Комментарий',
+            )
+        cls.post = post
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_budgets(self):
+        client = Client()
+        client.force_login(self.reader)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=кот',
+            reverse('posts:api_index'),
+        )
+        for url in urls:
+            for current in (client, self.client):
+                with self.subTest(url=url, anonymous=current is self.client):
+                    cache.clear()
+                    self.assertIn(current.get(url).status_code, (200, 302))
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from ..models import Comment, Group, Post
+from ..stemmer import stem
+
+User = get_user_model()
+
+
+class StemmerTests(TestCase):
+    def test_stem(self):
+        for word, expected in (
+            ('книги', 'книг'),
+            ('красивая', 'красив'),
+            ('бегающий', 'бега'),
+            ('важнейшими', 'важн'),
+            ('валяется', 'валя'),
+            ('котов', 'кот'),
+            ('ёжик', 'ежик'),
+            ('python', 'python'),
+        ):
+            with self.subTest(word=word):
+                self.assertEqual(stem(word), expected)
+
+
+class SearchMixin:
+    def setUp(self):
+        cache.clear()
+        search.rebuild()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Кошки', slug='cats', description='Про кошек',
+        )
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Рыжие коты спят на солнце',
+        )
+        cls.grouped = Post.objects.create(
+            author=cls.author, text='Фото дня', group=cls.group,
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.author, text='Собаки гуляют во дворе',
+        )
+
+    def found(self, query):
+        return [pk for _, pk in search.search(query)]
+
+    def test_stemmed_match(self):
+        self.assertEqual(self.found('рыжий кот'), [self.cats.pk])
+        self.assertEqual(self.found('собака'), [self.dogs.pk])
+        self.assertEqual(self.found('кот собака'), [])
+
+    def test_comments_and_group_indexed(self):
+        self.assertEqual(self.found('кошками'), [self.grouped.pk])
+        Comment.objects.create(
+            post=self.dogs, author=self.author, text='Какие кошки?',
+        )
+        self.assertEqual(
+            self.found('кошки'), [self.grouped.pk, self.dogs.pk]
+        )
+
+    def test_index_follows_changes(self):
+        post = Post.objects.get(pk=self.cats.pk)
+        post.text = 'Теперь про попугаев'
+        post.save()
+        self.assertEqual(self.found('кот'), [])
+        self.assertEqual(self.found('попугай'), [self.cats.pk])
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Котики'
+        group.save()
+        self.assertEqual(self.found('котик'), [self.grouped.pk])
+        Group.objects.filter(pk=self.group.pk).delete()
+        self.assertEqual(self.found('котик'), [])
+        Post.objects.filter(pk=self.dogs.pk).delete()
+        self.assertEqual(self.found('собака'), [])
+
+    def test_comment_changes_match_rebuild(self):
+        comments = [
+            Comment.objects.create(post=self.dogs, author=self.author,
+                                   text=text)
+            for text in ('Рыжие собаки', 'Кот и собака', 'Рыжие собаки')
+        ]
+        comments[0].delete()
+        comments[1].delete()
+        incremental = [search.search(query) for query in ('рыжий', 'кот')]
+        search.rebuild()
+        self.assertEqual(
+            [search.search(query) for query in ('рыжий', 'кот')],
+            incremental,
+        )
+        self.assertEqual(self.found('кот'), [self.cats.pk])
+
+    def test_cursor_pages(self):
+        posts = [
+            Post.objects.create(author=self.author, text='Снова коты ' * idx)
+            for idx in range(1, 6)
+        ]
+        url = reverse('posts:search')
+        seen, query = [], {'q': 'кот'}
+        while True:
+            response = self.client.get(url, query)
+            seen += response.context['posts']
+            if not response.context['next_cursor']:
+                break
+            query['cursor'] = response.context['next_cursor']
+        self.assertEqual(
+            [post.pk for post in seen], self.found('кот')
+        )
+        self.assertCountEqual(seen, posts + [self.cats])
+
+    def test_bad_cursor_is_first_page(self):
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кот', 'cursor': 'garbage'}
+        )
+        self.assertEqual(response.context['posts'], [self.cats])
+
+    def test_admin_search(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собаки'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.dogs]
+        )
+
+
+@override_settings(SEARCH_BACKEND='fts5')
+class FTS5SearchTests(SearchMixin, TestCase):
+    pass
+
+
+@override_settings(SEARCH_BACKEND='inverted')
+class InvertedIndexSearchTests(SearchMixin, TestCase):
+    pass
@@ -0,0 +1,79 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db.models import F
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+
+class SeedCommandTests(TestCase):
+    def seed(self, prefix, **options):
+        options = {
+            'users': 30, 'groups': 3, 'posts': 60, 'comments': 90,
+            'follows': 4, 'chunk_size': 7, 'prefix': prefix,
+            'stdout': StringIO(), **options,
+        }
+        call_command('seed_yatube', **options)
+        return options['stdout'].getvalue()
+
+    def test_counts_and_derived_data(self):
+        output = self.seed('a')
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 60)
+        self.assertEqual(Comment.objects.count(), 90)
+        self.assertIn('посты: 60/60', output)
+        self.assertIn('строк/с', output)
+        # Счётчики пересчитаны, подписчиков больше всех у первого.
+        first = User.objects.get(username='a0')
+        self.assertEqual(
+            first.stats.followers_count,
+            Follow.objects.filter(author=first).count(),
+        )
+        self.assertEqual(
+            UserStats.objects.order_by('-followers_count').first().user,
+            first,
+        )
+        self.assertEqual(
+            sum(Post.objects.values_list('comments_count', flat=True)), 90
+        )
+        # Вставка шла с явными pk: новые строки получают следующие.
+        post = Post.objects.create(author=first, text='Новый')
+        self.assertGreater(post.pk, 60)
+
+    def test_dates_spread(self):
+        self.seed('a', skip_derived=True)
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True
+        ))
+        # Без совпадений и по возрастанию pk, в пределах года.
+        self.assertEqual(dates, sorted(set(dates)))
+        self.assertGreater(dates[-1] - dates[0], timedelta(days=300))
+        late = Comment.objects.filter(created__lt=F('post__pub_date'))
+        self.assertFalse(late.exists())
+        self.assertGreater(
+            Comment.objects.values('created').distinct().count(), 80
+        )
+
+    def test_deterministic(self):
+        self.seed('a', skip_derived=True)
+        texts = list(Post.objects.order_by('pk').values_list(
+            'text', 'author__username'
+        ))
+        Post.objects.all().delete()
+        self.seed('b', skip_derived=True)
+        self.assertEqual(
+            [(text, author[1:]) for text, author in texts],
+            [
+                (text, author[1:]) for text, author in Post.objects.filter(
+                    author__username__startswith='b'
+                ).order_by('pk').values_list('text', 'author__username')
+            ],
+        )
+
+    def test_prefix_taken(self):
+        User.objects.create_user(username='seed1')
+        with self.assertRaises(CommandError):
+            self.seed('seed')
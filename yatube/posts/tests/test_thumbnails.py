@@ -0,0 +1,84 @@
+import io
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+User = get_user_model()
+
+
+def make_png(width=100, height=50):
+    content = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(content, 'PNG')
+    return SimpleUploadedFile(
+        'picture.png', content.getvalue(), content_type='image/png'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.author, text='С картинкой', image=make_png(),
+        )
+        cls.url = reverse('posts:post_detail', kwargs={
+            'post_id': cls.post.pk,
+        })
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_original_until_generated(self):
+        """Пока миниатюры нет, показывается оригинал, а не генерация."""
+        self.assertIsNone(thumbnails.lookup(self.post.image.name, 'card'))
+        response = self.client.get(self.url)
+        self.assertContains(response, f'src="{self.post.image.url}"')
+        self.assertIsNone(thumbnails.lookup(self.post.image.name, 'card'))
+
+    def test_generated_thumbnail_with_size(self):
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image.name, 'card')
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+        response = self.client.get(self.url)
+        self.assertContains(
+            response, f'src="{thumbnail.url}" width="960" height="339"'
+        )
+
+    def test_generation_refreshes_cached_pages(self):
+        index = reverse('posts:index')
+        self.assertContains(
+            self.client.get(index), f'src="{self.post.image.url}"'
+        )
+        thumbnails.generate(self.post.image.name)
+        thumbnail = thumbnails.lookup(self.post.image.name, 'card')
+        self.assertContains(self.client.get(index), f'src="{thumbnail.url}"')
+
+    def test_new_image_drops_old_thumbnails(self):
+        thumbnails.generate(self.post.image.name)
+        self.client.force_login(self.author)
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Другая картинка', 'image': make_png(80, 80)},
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertNotEqual(post.image.name, self.post.image.name)
+        self.assertIsNone(post.thumbnail('card'))
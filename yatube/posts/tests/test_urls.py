@@ -105,14 +105,16 @@ class StaticURLTests(TestCase):
                 self.assertTemplateUsed(response, template)
 
     def test_cache(self):
-        posts_count = Post.objects.count()
+        response = self.client.get('/').content
+        # Правка в обход сигналов не сбрасывает версию: страница из кэша.
+        Post.objects.filter(pk=self.post.pk).update(text='Изменённый текст')
+        self.assertEqual(response, self.client.get('/').content)
+        cache.clear()
+        self.assertNotEqual(response, self.client.get('/').content)
+
+    def test_cache_invalidated_by_new_post(self):
         response = self.client.get('/').content
         Post.objects.create(
             author=self.author,
             text='Тестовая группа',)
-        self.assertEqual(Post.objects.count(), posts_count + 1)
-        self.assertEqual(
-            response, self.client.get('/').content)
-        cache.clear()
-        self.assertNotEqual(
-            response, self.client.get('/').content)
+        self.assertNotEqual(response, self.client.get('/').content)
@@ -0,0 +1,121 @@
+"""Миниатюры картинок постов готовятся заранее, при загрузке.
+
+Адреса и размеры готовых миниатюр записываются в Post.thumbnails:
+карточки читают их вместе с постом, без запросов в хранилище sorl и
+без открытия файлов; пока миниатюр нет, показывается оригинал.
+Готовые миниатюры меняют версии кэша поста и его лент: закэшированные
+карточки с оригиналом больше не отдаются.
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.apps import apps as django_apps
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+class PrecomputedBackend(ThumbnailBackend):
+    def resolve_options(self, source, options):
+        # Те же умолчания, что подставляет get_thumbnail: от них
+        # зависит имя файла миниатюры.
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def lookup(self, file_, geometry_string, **options):
+        """Готовая миниатюра из хранилища или None, без генерации."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.resolve_options(source, options)
+        )
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+
+backend = PrecomputedBackend()
+
+
+def lookup(image, geometry):
+    geometry_string, options = settings.THUMBNAIL_GEOMETRIES[geometry]
+    return backend.lookup(image, geometry_string, **options)
+
+
+def generate(name):
+    """Строит все используемые на сайте миниатюры картинки."""
+    built = {}
+    for geometry, (geometry_string, options) in (
+        settings.THUMBNAIL_GEOMETRIES.items()
+    ):
+        thumbnail = backend.get_thumbnail(name, geometry_string, **options)
+        built[geometry] = [thumbnail.url, thumbnail.width, thumbnail.height]
+    Post = django_apps.get_model('posts', 'Post')
+    Post.objects.filter(image=name).update(thumbnails=json.dumps(built))
+    refresh_posts(name)
+
+
+def refresh_posts(name):
+    """Новые версии кэша постов с картинкой ``name`` и их лент."""
+    Post = django_apps.get_model('posts', 'Post')
+    keys = set()
+    for post_id, author_id, group_id in Post.objects.filter(
+        image=name
+    ).values_list('pk', 'author_id', 'group_id'):
+        keys |= {
+            cache.index_key(), cache.post_key(post_id),
+            cache.profile_key(author_id),
+        }
+        if group_id:
+            keys.add(cache.group_key(group_id))
+    cache.bump(*keys)
+
+
+def generate_in_worker(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+    finally:
+        # Соединения потока пула с БД (хранилище sorl) больше
+        # никому не нужны.
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def schedule(image):
+    """Ставит генерацию в пул после коммита: файл уже сохранён."""
+    if not image:
+        return
+    name = image.name
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: generate(name))
+        return
+    transaction.on_commit(
+        lambda: get_executor().submit(generate_in_worker, name)
+    )
@@ -0,0 +1,181 @@
+from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.db import transaction
+
+FANOUT_BATCH_SIZE = 500
+
+
+def is_pulled(author_id):
+    """Посты автора подбираются при чтении, а не рассылаются."""
+    UserStats = django_apps.get_model('posts', 'UserStats')
+    return UserStats.objects.filter(
+        user_id=author_id, timeline_pulled=True
+    ).exists()
+
+
+def switch_to_pull(author_id):
+    """Автор набрал TIMELINE_FANOUT_LIMIT подписчиков: новые посты
+    подбираются при чтении. Разосланные раньше остаются в лентах."""
+    UserStats = django_apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        user_id=author_id, timeline_pulled=False,
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT,
+    ).update(timeline_pulled=True)
+
+
+def switch_to_push(author_id):
+    """Подписчиков стало меньше TIMELINE_PUSH_LIMIT: посты снова
+    рассылаются, пропущенные дописываются в ленты.
+
+    Порог ниже TIMELINE_FANOUT_LIMIT: отписка и подписка одного
+    читателя у границы не гоняют автора туда и обратно с дописыванием
+    тысячи лент на каждом шаге.
+    """
+    UserStats = django_apps.get_model('posts', 'UserStats')
+    switched = UserStats.objects.filter(
+        user_id=author_id, timeline_pulled=True,
+        followers_count__lt=settings.TIMELINE_PUSH_LIMIT,
+    ).update(timeline_pulled=False)
+    if switched:
+        backfill_followers(author_id)
+
+
+def _insert(entries, apps=django_apps):
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Рассылает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    Follow = django_apps.get_model('posts', 'Follow')
+    TimelineEntry = django_apps.get_model('posts', 'TimelineEntry')
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    _insert([
+        TimelineEntry(user_id=user_id, post_id=post.pk)
+        for user_id in followers.iterator()
+    ])
+
+
+def fan_out_many(posts):
+    """Рассылка пачки постов: один запрос подписчиков на всех авторов.
+
+    ``posts`` - пары (post_id, author_id).
+    """
+    Follow = django_apps.get_model('posts', 'Follow')
+    TimelineEntry = django_apps.get_model('posts', 'TimelineEntry')
+    UserStats = django_apps.get_model('posts', 'UserStats')
+    by_author = defaultdict(list)
+    for post_id, author_id in posts:
+        by_author[author_id].append(post_id)
+    pulled = set(UserStats.objects.filter(
+        user_id__in=list(by_author), timeline_pulled=True,
+    ).values_list('user_id', flat=True))
+    follows = Follow.objects.filter(
+        author_id__in=[pk for pk in by_author if pk not in pulled]
+    ).values_list('user_id', 'author_id')
+    _insert([
+        TimelineEntry(user_id=user_id, post_id=post_id)
+        for user_id, author_id in follows.iterator()
+        for post_id in by_author[author_id]
+    ])
+
+
+def backfill(user_id, author_id, apps=django_apps):
+    """Добавляет в ленту подписчика последние посты автора."""
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    recent = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', flat=True)[:settings.TIMELINE_BACKFILL]
+    _insert([
+        TimelineEntry(user_id=user_id, post_id=post_id)
+        for post_id in recent
+    ], apps)
+
+
+def forget(user_id, author_id):
+    TimelineEntry = django_apps.get_model('posts', 'TimelineEntry')
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def backfill_followers(author_id):
+    """Дописывает последние посты автора в ленты всех подписчиков.
+
+    Посты выбираются один раз на всех, вставка - пачками.
+    """
+    Follow = django_apps.get_model('posts', 'Follow')
+    Post = django_apps.get_model('posts', 'Post')
+    TimelineEntry = django_apps.get_model('posts', 'TimelineEntry')
+    recent = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', flat=True)[:settings.TIMELINE_BACKFILL])
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+    _insert([
+        TimelineEntry(user_id=user_id, post_id=post_id)
+        for user_id in followers.iterator()
+        for post_id in recent
+    ])
+
+
+def assign_modes(apps=django_apps):
+    """Популярны ровно авторы с TIMELINE_FANOUT_LIMIT подписчиков."""
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.update(timeline_pulled=False)
+    UserStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(timeline_pulled=True)
+
+
+def rebuild():
+    """Заполняет ленты по всем подпискам заново.
+
+    Подписки перебираются по авторам: последние посты автора
+    выбираются один раз на всех его подписчиков. Посты популярных
+    авторов (is_pulled) не рассылаются, как и при публикации; кто
+    популярен, решается заново по TIMELINE_FANOUT_LIMIT.
+    """
+    Follow = django_apps.get_model('posts', 'Follow')
+    Post = django_apps.get_model('posts', 'Post')
+    TimelineEntry = django_apps.get_model('posts', 'TimelineEntry')
+    UserStats = django_apps.get_model('posts', 'UserStats')
+    assign_modes()
+    pulled = set(UserStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('user_id', flat=True))
+    follows = Follow.objects.order_by('author_id').values_list(
+        'author_id', 'user_id'
+    )
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        entries = []
+        for author_id, rows in groupby(
+            follows.iterator(), key=itemgetter(0)
+        ):
+            if author_id in pulled:
+                continue
+            recent = list(Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-id'
+            ).values_list('pk', flat=True)[:settings.TIMELINE_BACKFILL])
+            for _, user_id in rows:
+                entries += [
+                    TimelineEntry(user_id=user_id, post_id=post_id)
+                    for post_id in recent
+                ]
+            if len(entries) >= FANOUT_BATCH_SIZE:
+                _insert(entries)
+                entries = []
+        _insert(entries)
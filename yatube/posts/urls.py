@@ -1,17 +1,23 @@
 from django.urls import path
-from django.views.decorators.cache import cache_page
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
 urlpatterns = [
-    path('', cache_page(20)(views.index), name='index'),
+    path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('search/', views.post_search, name='search'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='create_post'),
+    path('export/', views.post_export, name='post_export'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
@@ -26,4 +32,17 @@ urlpatterns = [
         views.profile_unfollow,
         name="profile_unfollow"
     ),
+    path('api/v1/posts/', api.index, name='api_index'),
+    path(
+        'api/v1/posts/<int:post_id>/',
+        api.post_detail,
+        name='api_post_detail'
+    ),
+    path('api/v1/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path(
+        'api/v1/profile/<str:username>/',
+        api.profile,
+        name='api_profile'
+    ),
+    path('api/v1/follow/', api.follow_index, name='api_follow_index'),
 ]
@@ -1,21 +1,42 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.cache import cache as django_cache
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
 
+from core import fragments
+from core.routing import use_replica
+
+from . import cache, export, search, thumbnails
+from .conditional import (
+    conditional, get_post, group_id, group_keys, index_keys, post_page_keys,
+    profile_keys, user_id,
+)
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Comment, Follow
+from .models import Group, Post, User, UserStats, Comment, Follow
+from .paginators import COMMENTS_ORDERING, KeysetPaginator, get_page_obj
+
+
+def group_version_key(request, slug):
+    found = group_id(request, slug)
+    return found and cache.group_key(found)
+
 
+def profile_version_key(request, username):
+    found = user_id(request, username)
+    return found and cache.profile_key(found)
 
-@cache_page(60 * 15)
+
+@use_replica
+@conditional(index_keys, pages=True)
+@cache.cache_feed(lambda request: cache.index_key())
 def index(request):
     templates = 'posts/index.html'
     text = 'Это главная страница проекта Yatube'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.index_feed()
+    page_obj = get_page_obj(request, post_list)
+    cache.attach_versions(page_obj)
     context = {
         'text': text,
         'page_obj': page_obj,
@@ -23,14 +44,16 @@ def index(request):
     return render(request, templates, context)
 
 
+@use_replica
+@conditional(group_keys, pages=True)
+@cache.cache_feed(group_version_key)
 def group_posts(request, slug):
     templates = 'posts/group_list.html'
     text = 'Здесь будет информация о группах проекта Yatube'
     group = get_object_or_404(Group, slug=slug)
-    post_list = Post.objects.filter(group=group)
-    paginator = Paginator(post_list, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.group_feed(group)
+    page_obj = get_page_obj(request, post_list, count=group.posts_count)
+    cache.attach_versions(page_obj)
     context = {
         'text': text,
         'group': group,
@@ -39,35 +62,119 @@ def group_posts(request, slug):
     return render(request, templates, context)
 
 
+@use_replica
+@conditional(profile_keys, pages=True)
+@cache.cache_feed(profile_version_key)
 def profile(request, username):
     user = get_object_or_404(User, username=username)
-    following = request.user.is_authenticated and Follow.objects.filter(
-        author=user, user=request.user
-    ).exists()
-    post_list = Post.objects.filter(author=user)
-    paginator = Paginator(post_list, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    author_stats = UserStats.get_for(user)
+    post_list = Post.objects.author_feed(user)
+    page_obj = get_page_obj(
+        request, post_list, count=author_stats.posts_count
+    )
+    cache.attach_versions(page_obj)
     context = {
         'user': user,
         'profile': user,
         'page_obj': page_obj,
-        'following': following,
         'author': user,
+        'author_stats': author_stats,
     }
     return render(request, "posts/profile.html", context)
 
 
+@fragments.context('posts/includes/profile_actions.html')
+def profile_actions(request, author_id, username):
+    user = request.user
+    return {
+        'is_owner': user.pk == author_id,
+        'following': user.is_authenticated and Follow.objects.filter(
+            author_id=author_id, user=user
+        ).exists(),
+    }
+
+
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = [], None
+    if query:
+        posts, next_cursor = search.get_page(
+            query, request.GET.get('cursor'),
+            settings.SEARCH_RESULTS_PER_PAGE,
+        )
+    context = {
+        'query': query,
+        'posts': cache.attach_versions(posts),
+        'next_cursor': next_cursor,
+        'is_first': not request.GET.get('cursor'),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def render_comments(request, post_id, count=None):
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    ).only('text', 'created', 'author', 'author__username')
+    paginator = KeysetPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ordering=COMMENTS_ORDERING,
+        count=count,
+    )
+    page_obj = paginator.get_page(
+        request.GET.get('page'), request.GET.get('cursor')
+    )
+    return render_to_string('posts/includes/comments.html', {
+        'page_obj': page_obj,
+        'post_id': post_id,
+    }, request)
+
+
+def first_comments(request, post_id, count=None):
+    """Первая страница комментариев, закэшированная до новой версии поста.
+
+    Версия поста меняется при каждом новом или удалённом комментарии.
+    ``count`` - Post.comments_count, если пост уже загружен.
+    """
+    version, = cache.get_versions([cache.post_key(post_id)])
+    key = f'comments:{post_id}:{version}'
+    html = django_cache.get(key)
+    if html is None:
+        html = render_comments(request, post_id, count)
+        django_cache.set(key, html, settings.FEED_CACHE_TIMEOUT)
+    return html
+
+
+def post_comments(request, post_id):
+    """Следующие страницы комментариев для подгрузки при прокрутке."""
+    post = get_object_or_404(
+        Post.objects.only('pk', 'comments_count'), id=post_id
+    )
+    if not request.GET.get('cursor') and request.GET.get('page') in (
+        None, '1'
+    ):
+        return HttpResponse(
+            first_comments(request, post_id, post.comments_count)
+        )
+    return HttpResponse(
+        render_comments(request, post_id, post.comments_count)
+    )
+
+
+@use_replica
+@conditional(post_page_keys, pages=True)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    posts_count = post.author.posts.all().count()
+    post = get_post(request, post_id)
+    if post is None:
+        raise Http404
+    posts_count = UserStats.get_for(post.author).posts_count
     is_author = request.user == post.author
     context = {
         'post': post,
         'post_id': post_id,
         'posts_count': posts_count,
         'is_author': is_author,
-        'comments': Comment.objects.filter(post=post),
+        'comments_html': first_comments(
+            request, post.pk, post.comments_count
+        ),
     }
     form = CommentForm(request.POST or None)
     if form.is_valid():
@@ -87,6 +194,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post.image)
         return redirect('posts:profile', username=request.user)
     return render(request, 'posts/create_post.html', {'form': form})
 
@@ -100,7 +208,13 @@ def post_edit(request, post_id):
         form = PostForm(request.POST or None,
                         files=request.FILES or None, instance=post)
         if form.is_valid():
-            form.save()
+            post = form.save(commit=False)
+            if 'image' in form.changed_data:
+                # Миниатюры прежней картинки.
+                post.thumbnails = ''
+            post.save()
+            if 'image' in form.changed_data:
+                thumbnails.schedule(post.image)
             return redirect('posts:post_detail', post_id=post_id)
     form = PostForm(instance=post)
     return render(request, 'posts/create_post.html', {
@@ -123,11 +237,24 @@ def add_comment(request, post_id):
 
 
 @login_required
+def post_export(request):
+    """Все посты автора одним файлом, без загрузки их в память."""
+    fmt = request.GET.get('format')
+    if fmt not in export.FORMATS:
+        fmt = 'ndjson'
+    return export.response(
+        'posts', fmt, compress='gzip' in request.GET,
+        queryset=Post.objects.filter(author=request.user),
+        name=f'posts-{request.user.username}',
+    )
+
+
+@login_required
+@use_replica
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, settings.PAGINATOR_OBJECTS_PER_PAGE)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.follow_feed(request.user)
+    page_obj = get_page_obj(request, posts)
+    cache.attach_versions(page_obj)
     return render(request, 'posts/follow.html', {'page_obj': page_obj})
 
 
@@ -25,11 +25,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,6 +66,18 @@ DATABASES = {
     }
 }
 
+# PRAGMA для каждого нового соединения с SQLite (core.db); боевой
+# набор - в settings_production
+SQLITE_PRAGMAS = {}
+
+# Алиасы реплик для чтения лент (core.routing); пусто - всё читается
+# из default. Пример с двумя файлами SQLite - settings_replica
+DATABASE_ROUTERS = ['core.routing.ReplicaRouter']
+DATABASE_REPLICAS = []
+# Сколько секунд после записи клиент читает только из default
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'pin_primary'
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -96,6 +110,9 @@ STATIC_URL = '/static/'
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+# Отдавать STATIC_ROOT из WSGI-процесса (core.static.StaticFiles).
+SERVE_STATIC = False
+
 LOGIN_URL = 'users:login'
 
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -106,12 +123,105 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
 PAGINATOR_OBJECTS_PER_PAGE = 10
 
+# Комментариев на странице под постом и при подгрузке
+COMMENTS_PER_PAGE = 20
+
+# Сколько первых страниц ленты доступно по ?page=, дальше - только ?cursor=
+PAGINATOR_OFFSET_PAGES = 5
+
+# Верхняя граница COUNT(*) при подсчёте числа страниц
+PAGINATOR_COUNT_LIMIT = 1000
+
+# Сколько секунд CachedCountPaginator (админка) помнит число записей
+PAGINATOR_COUNT_CACHE_TIMEOUT = 60
+
+# Посты авторов с таким числом подписчиков не рассылаются по лентам
+# подписчиков при публикации, а подмешиваются в ленту при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+
+# Ниже этого числа подписчиков посты автора снова рассылаются, а
+# пропущенные дописываются в ленты. Зазор с TIMELINE_FANOUT_LIMIT не
+# даёт одному читателю подпиской и отпиской гонять автора туда-обратно
+TIMELINE_PUSH_LIMIT = 800
+
+# Сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL = 100
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Отдавать MEDIA_ROOT приложением (core.media) и вне DEBUG. Наружу
+# видны только каталоги MEDIA_SERVE_PREFIXES: картинки постов и
+# миниатюры sorl.
+SERVE_MEDIA = False
+MEDIA_SERVE_PREFIXES = ['posts/', 'cache/']
+
+# Имя миниатюры sorl - хэш исходника и опций, файл под ним не меняется:
+# кэш на год. Остальное браузер перепроверяет по ETag раз в сутки.
+MEDIA_IMMUTABLE_PREFIXES = ['cache/']
+MEDIA_MAX_AGE = 60 * 60 * 24
+
+# Файл отдаёт прокси: 'x-accel-redirect' (nginx, внутренний location
+# MEDIA_OFFLOAD_PREFIX) или 'x-sendfile' (Apache, lighttpd).
+MEDIA_OFFLOAD = None
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
+
+# Загрузки пишутся во временный файл на диске, а не в память
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Лимиты на картинки постов и параметры хранимого оригинала
+IMAGE_MAX_BYTES = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 10 ** 6
+IMAGE_MAX_SIDE = 2048
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 85
+
+# Миниатюры, которые строятся при загрузке картинки поста:
+# имя -> (геометрия, опции sorl-thumbnail)
+THUMBNAIL_GEOMETRIES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+    'card_small': ('480x170', {'crop': 'center', 'upscale': True}),
+}
+
+# Потоков в пуле, где строятся миниатюры; 0 - строить сразу после
+# коммита в потоке запроса (так в тестах: общая БД SQLite в памяти не
+# пускает запись из второго потока)
+THUMBNAIL_WORKERS = 2
+
+# Индекс поиска: 'fts5', 'inverted' (таблицы Django) или 'auto' -
+# FTS5, если SQLite собран с ним
+SEARCH_BACKEND = 'auto'
+
+# Сколько результатов поиска на странице
+SEARCH_RESULTS_PER_PAGE = 10
+
+# Строк, читаемых из БД за раз при потоковой выгрузке (posts.export)
+EXPORT_CHUNK_SIZE = 2000
+
+# Сколько последних запросов помнит core.middleware.ProfilingMiddleware
+PROFILING_BUFFER_SIZE = 1000
+
+# Бюджеты SQL-запросов по имени URL. Превышение пишется в лог, а при
+# QUERY_BUDGET_ERRORS запрос падает с исключением (так их ловят тесты)
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 6,
+    'posts:profile': 7,
+    'posts:post_detail': 5,
+    'posts:follow_index': 4,
+    'posts:search': 5,
+    'posts:api_index': 5,
+}
+QUERY_BUDGET_ERRORS = False
+
+# Страницы лент живут в кэше до смены версии данных, но не дольше этого
+FEED_CACHE_TIMEOUT = 60 * 15
+
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -0,0 +1,57 @@
+# Настройки боевого сервера: DJANGO_SETTINGS_MODULE=yatube.settings_production
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, TEMPLATES
+
+DEBUG = False
+
+# Соединение живёт между запросами воркера, а не открывается на каждый.
+DATABASES = {'default': {**DATABASES['default'], 'CONN_MAX_AGE': 60}}
+
+# Шаблон разбирается один раз на процесс; core.warmup компилирует все
+# шаблоны ещё при старте воркера (yatube/wsgi.py).
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'debug': False,
+        'loaders': [('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+    },
+}]
+
+# Имена статики с хэшем содержимого и сжатые копии (core.static);
+# воркер сам отдаёт их с кэшем на год.
+STATICFILES_STORAGE = 'core.static.CompressedManifestStorage'
+SERVE_STATIC = True
+SERVE_MEDIA = True
+
+# WAL: читатели не ждут писателя, а писатель - читателей. NORMAL
+# синхронизирует диск только на контрольных точках WAL; mmap и кэш
+# страниц - на соединение; busy_timeout - сколько ждать чужую запись
+# вместо немедленного «database is locked».
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+# Один кэш на все воркеры: версии лент сбрасываются сразу везде.
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'TIMEOUT': 60 * 15,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    }
+}
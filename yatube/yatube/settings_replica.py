@@ -0,0 +1,18 @@
+# Реплика для чтения лент на локальной машине - второй файл SQLite:
+# DJANGO_SETTINGS_MODULE=yatube.settings_replica. Копию основной базы
+# обновляет ``manage.py sync_replica``, с ``--interval`` - в цикле.
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    'replica': {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+        # В тестах реплика - та же тестовая база.
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_REPLICAS = ['replica']
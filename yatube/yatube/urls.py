@@ -1,9 +1,12 @@
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core import media
+from core.views import profiling_dashboard
 
 urlpatterns = [
+    path('admin/profiling/', profiling_dashboard, name='profiling'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
@@ -15,7 +18,8 @@ handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
 
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
+if settings.DEBUG or settings.SERVE_MEDIA:
+    urlpatterns += [re_path(
+        r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), media.serve,
+        name='media',
+    )]
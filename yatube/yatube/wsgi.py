@@ -1,7 +1,17 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
+from core.static import StaticFiles
+from core.warmup import warm_templates
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+if settings.SERVE_STATIC:
+    application = StaticFiles(application)
+
+# Шаблоны компилируются при старте воркера, а не на первых запросах.
+warm_templates()